@@ -0,0 +1,82 @@
+"""
+bench_duration_windows.py
+Rolling-step timings for count vs duration windows on a synthetic tick
+file, per engine, plus the numpy engine's std error on a long drifting
+series. Numbers feed the "Duration-based rolling windows" section of
+performance_report.md.
+
+Run with:
+    python benchmarks/bench_duration_windows.py [--rows 1000000]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from parallel_fin.data_loader import load_market_data_pandas, load_market_data_polars  # noqa: E402
+from parallel_fin.kernels import count_window_starts, rolling_mean_std  # noqa: E402
+from parallel_fin.metrics import compute_rolling_polars, rolling_metrics_frame  # noqa: E402
+
+
+def write_ticks(path: str, rows: int, n_symbols: int = 20, days: int = 5, seed: int = 0) -> None:
+    rng = np.random.default_rng(seed)
+    ts = pd.Timestamp("2024-01-01") + pd.to_timedelta(np.sort(rng.integers(0, days * 86400 * 10**9, rows)), unit="ns")
+    symbols = rng.choice([f"S{i:02d}" for i in range(n_symbols)], rows)
+    price = 100 * np.exp(np.cumsum(rng.normal(0, 1e-3, rows)))
+    pd.DataFrame({"timestamp": ts, "symbol": symbols, "price": price.round(4)}).to_csv(path, index=False)
+
+
+def best_of(fn, repeats: int) -> float:
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def drift_error(rows: int, window: int = 20) -> float:
+    """Largest relative gap between the numpy engine's std and a two-pass std on a trending series."""
+    from numpy.lib.stride_tricks import sliding_window_view
+
+    rng = np.random.default_rng(1)
+    x = 100 + 0.5 * np.arange(rows) + rng.normal(0, 0.01, rows)
+    _, std = rolling_mean_std(x, count_window_starts(rows, window), window)
+    ref = sliding_window_view(x, window).std(axis=1, ddof=1)
+    return float(np.max(np.abs(std[window - 1:] / ref - 1)))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[2])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as d:
+        csv = os.path.join(d, "ticks.csv")
+        write_ticks(csv, args.rows)
+        pd_df = load_market_data_pandas(csv)
+        pl_df = load_market_data_polars(csv)
+
+    print(f"{'window':>8} | {'pandas':>8} | {'numpy':>8} | {'polars':>8} | max rel gap numpy vs pandas")
+    for window in (20, "15m", "1d"):
+        t_pd = best_of(lambda: rolling_metrics_frame(pd_df, window), args.repeats)
+        t_np = best_of(lambda: rolling_metrics_frame(pd_df, window, engine="numpy"), args.repeats)
+        t_pl = best_of(lambda: compute_rolling_polars(pl_df, window), args.repeats)
+        ref = rolling_metrics_frame(pd_df, window).to_numpy()
+        vec = rolling_metrics_frame(pd_df, window, engine="numpy").to_numpy()
+        with np.errstate(divide="ignore", invalid="ignore"):
+            gap = np.abs(vec / ref - 1)
+        print(f"{window!s:>8} | {t_pd:8.3f} | {t_np:8.3f} | {t_pl:8.3f} | {np.nanmax(gap[np.isfinite(gap)]):.1e}")
+
+    print(f"numpy engine std vs two-pass on a drifting {args.rows:,}-row series: {drift_error(args.rows):.1e} relative")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+bench_montecarlo.py
+Accuracy and throughput of monte_carlo_var_es on a synthetic book: mean
+relative error of every node's VaR / ES against the closed-form Gaussian
+values, and paths/sec in total and per worker process for each
+--workers count. Numbers feed the "Monte Carlo VaR / ES" section of
+performance_report.md.
+
+Per-worker throughput only measures per-core scaling when the machine has
+at least that many free cores; the script prints how many it can use.
+
+Run with:
+    python benchmarks/bench_montecarlo.py [--paths 2000000] [--workers 1 2 4]
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from parallel_fin.montecarlo import estimate_return_model, monte_carlo_var_es  # noqa: E402
+from parallel_fin.scenarios import build_scenario_model  # noqa: E402
+
+Z_99 = 2.3263478740408408       # standard normal 99% quantile
+ES_99 = 2.665214220345808       # standard normal 99% expected shortfall
+
+
+def make_book(n_symbols: int = 20, n_days: int = 500, depth: int = 3, seed: int = 0):
+    """n_symbols correlated price series and a tree with 3 children and 3 positions per node."""
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range("2020-01-01", periods=n_days)
+    market = rng.normal(0, 0.01, n_days)
+    prices = {
+        f"S{i:02d}": pd.Series(100 * np.exp(np.cumsum(market * rng.uniform(0.5, 1.5) + rng.normal(0, 0.01, n_days))),
+                               index=dates)
+        for i in range(n_symbols)
+    }
+
+    def node(level, name):
+        out = {"name": name, "positions": [{"symbol": f"S{rng.integers(n_symbols):02d}",
+                                            "quantity": int(rng.integers(1, 100))} for _ in range(3)]}
+        if level < depth:
+            out["sub_portfolios"] = [node(level + 1, f"{name}.{j}") for j in range(3)]
+        return out
+
+    return node(0, "root"), prices
+
+
+def usable_cores() -> int:
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[2])
+    parser.add_argument("--paths", type=int, default=2_000_000, help="paths for the throughput runs")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2])
+    parser.add_argument("--seeds", type=int, default=5)
+    args = parser.parse_args()
+
+    tree, prices = make_book()
+    model = build_scenario_model(tree, prices)
+    mu, cov = estimate_return_model(prices, model.symbols)
+    cs = np.concatenate([np.zeros((len(model.symbols), 1)), np.cumsum(model.exposure, axis=1)], axis=1)
+    subtree = cs[:, model.subtree_end] - cs[:, :-1]
+    sigma = np.sqrt(np.einsum("sn,st,tn->n", subtree, cov, subtree))
+    mean_loss = -(mu @ subtree)
+    true_var, true_es = mean_loss + Z_99 * sigma, mean_loss + ES_99 * sigma
+    print(f"{len(model.node_paths)} nodes, {len(model.symbols)} symbols, {usable_cores()} usable core(s)")
+
+    print(f"\n{'paths':>10} | VaR rel. error | ES rel. error  (mean over nodes and {args.seeds} seeds)")
+    for n in (10_000, 100_000, 1_000_000):
+        err_var, err_es = [], []
+        for seed in range(args.seeds):
+            res = monte_carlo_var_es(model, mu, cov, n_paths=n, batch_size=50_000, seed=seed)
+            err_var.append(np.abs(res["var"].to_numpy() / true_var - 1).mean())
+            err_es.append(np.abs(res["es"].to_numpy() / true_es - 1).mean())
+        print(f"{n:>10,} | {np.mean(err_var):13.2%} | {np.mean(err_es):12.2%}")
+
+    print(f"\n{'workers':>7} | {'paths/sec':>12} | {'paths/sec per worker':>20}")
+    for workers in args.workers:
+        start = time.perf_counter()
+        monte_carlo_var_es(model, mu, cov, n_paths=args.paths, batch_size=50_000, max_workers=workers)
+        rate = args.paths / (time.perf_counter() - start)
+        print(f"{workers:>7} | {rate:12,.0f} | {rate / workers:20,.0f}")
+
+
+if __name__ == "__main__":
+    main()
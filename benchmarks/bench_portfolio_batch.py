@@ -0,0 +1,86 @@
+"""
+bench_portfolio_batch.py
+Trees/sec of aggregate_portfolios_batch (via reporting.time_portfolio_batch)
+against a per-tree aggregate_portfolio_sequential loop, on random client
+books priced from one snapshot. Numbers feed the "Batch evaluation of many
+trees" section of performance_report.md.
+
+Per-worker throughput only measures per-core scaling when the machine has
+at least that many free cores; the script prints how many it can use.
+
+Run with:
+    python benchmarks/bench_portfolio_batch.py [--trees 5000] [--workers 1 2 4]
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from parallel_fin.portfolio import aggregate_portfolio_sequential  # noqa: E402
+from parallel_fin.reporting import time_portfolio_batch  # noqa: E402
+
+
+def make_books(n_trees: int, seed: int = 1):
+    """Random trees up to depth 3 with 0-3 positions per node; NOPRICE has no price history."""
+    rng = np.random.default_rng(seed)
+    symbols = ["AAPL", "GOOG", "MSFT", "NOPRICE"]
+
+    def node(depth, name):
+        out = {"name": name, "positions": []}
+        for _ in range(int(rng.integers(0, 4))):
+            pos = {"symbol": str(rng.choice(symbols)), "quantity": float(rng.integers(-5, 50))}
+            if rng.random() < 0.5:
+                pos["price"] = float(rng.uniform(10, 100))
+            out["positions"].append(pos)
+        if depth < 3:
+            out["sub_portfolios"] = [node(depth + 1, f"{name}.{i}") for i in range(int(rng.integers(0, 3)))]
+        return out
+
+    return [node(0, f"book{i}") for i in range(n_trees)]
+
+
+def make_prices(n_days: int = 40, seed: int = 7):
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range("2020-01-01", periods=n_days)
+    return {sym: pd.Series(base + rng.normal(0, base / 100, n_days).cumsum(), index=dates)
+            for sym, base in (("AAPL", 100), ("GOOG", 200), ("MSFT", 300))}
+
+
+def usable_cores() -> int:
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[2])
+    parser.add_argument("--trees", type=int, default=5000)
+    parser.add_argument("--sequential-trees", type=int, default=200,
+                        help="trees for the per-tree loop (it starts a process pool per node)")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2])
+    args = parser.parse_args()
+
+    trees, prices = make_books(args.trees), make_prices()
+    print(f"{args.trees:,} trees, {usable_cores()} usable core(s)")
+
+    start = time.perf_counter()
+    for tree in trees[:args.sequential_trees]:
+        aggregate_portfolio_sequential(tree, prices)
+    print(f"sequential loop ({args.sequential_trees} trees): "
+          f"{args.sequential_trees / (time.perf_counter() - start):,.1f} trees/sec")
+
+    print(f"\n{'workers':>7} | {'trees/sec':>10} | {'trees/sec per worker':>20}")
+    for workers in args.workers:
+        _, metrics = time_portfolio_batch(trees, prices, max_workers=workers)
+        rate = metrics["trees_per_sec"]
+        print(f"{workers:>7} | {rate:10,.0f} | {rate / workers:20,.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""
+bars.py
+Multi-frequency OHLC bars from raw ticks.
+
+Ticks from load_market_data_pandas / load_market_data_polars are grouped by
+symbol once and bucketed in a single sorted pass per symbol. The finest
+frequency is built from the ticks; every coarser frequency that is a whole
+multiple of a finer one is rolled up from those bars instead of re-reading
+the ticks. Buckets are aligned to the Unix epoch and labelled by their start.
+
+Each bar frame has the loader layout (timestamp index, 'symbol' column) plus
+open/high/low/close, count, volume and pv (sum of price * volume), so
+VWAP = pv / volume. Without a 'volume' column every tick counts as 1 and
+VWAP becomes the mean tick price. 'price' repeats 'close' so the frame can go
+straight into compute_rolling_pandas / rolling_metrics.
+"""
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from .metrics import symbol_groups
+from .parallel import merge_sorted_frames
+
+FIELDS = ("open", "high", "low", "close", "count", "volume", "pv")
+DEFAULT_FREQS = ("1min", "5min", "1h", "1D")
+
+
+def _freq_ns(freq: str) -> int:
+    ns = int(pd.to_timedelta(freq).value)
+    if ns <= 0:
+        raise ValueError(f"frequency must be positive: {freq!r}")
+    return ns
+
+
+def _rollup(start: np.ndarray, cols: Dict[str, np.ndarray], freq_ns: int) -> Dict[str, np.ndarray]:
+    """
+    Bucket time-ordered rows (ticks or finer bars) into bars of freq_ns.
+    `start` is each row's timestamp in ns; returns the same fields plus
+    'start' for the new bars.
+    """
+    bucket = start // freq_ns * freq_ns
+    first = np.flatnonzero(np.concatenate(([True], bucket[1:] != bucket[:-1])))
+    last = np.append(first[1:], len(bucket)) - 1
+    return {
+        "start": bucket[first],
+        "open": cols["open"][first],
+        "high": np.maximum.reduceat(cols["high"], first),
+        "low": np.minimum.reduceat(cols["low"], first),
+        "close": cols["close"][last],
+        "count": np.add.reduceat(cols["count"], first),
+        "volume": np.add.reduceat(cols["volume"], first),
+        "pv": np.add.reduceat(cols["pv"], first),
+    }
+
+
+def _merge_into(stored: Dict[str, List[np.ndarray]], new: Dict[str, np.ndarray]) -> None:
+    """Append new bars, folding the first one into the stored last bar if it is the same bucket."""
+    if not len(new["start"]):
+        return
+    if stored["start"] and stored["start"][-1][-1] == new["start"][0]:
+        tail = {k: v[-1] for k, v in stored.items()}
+        tail["high"][-1] = max(tail["high"][-1], new["high"][0])
+        tail["low"][-1] = min(tail["low"][-1], new["low"][0])
+        tail["close"][-1] = new["close"][0]
+        for k in ("count", "volume", "pv"):
+            tail[k][-1] += new[k][0]
+        new = {k: v[1:] for k, v in new.items()}
+    for k, v in new.items():
+        if len(v):
+            stored[k].append(v)
+
+
+class BarBuilder:
+    """
+    Incremental multi-frequency bar builder.
+
+    Call update() with successive tick frames (each symbol's ticks must not
+    go back in time across calls); the last bar of every symbol stays open
+    and absorbs later ticks in the same bucket. bars() returns the current
+    bars for one frequency, or a dict for all of them.
+    """
+
+    def __init__(self, freqs: Sequence[str] = DEFAULT_FREQS):
+        self.freqs = sorted(freqs, key=_freq_ns)
+        self._freq_ns = {f: _freq_ns(f) for f in self.freqs}
+        # rollup source for each frequency: the coarsest finer frequency dividing it, else raw ticks
+        self._source: Dict[str, Optional[str]] = {}
+        for i, f in enumerate(self.freqs):
+            src = [g for g in self.freqs[:i] if self._freq_ns[f] % self._freq_ns[g] == 0]
+            self._source[f] = src[-1] if src else None
+        self._bars: Dict[str, Dict[Any, Dict[str, List[np.ndarray]]]] = {f: {} for f in self.freqs}
+        self._last_ts: Dict[Any, int] = {}
+        self._datetime_index = True
+        self._symbol_dtype = None
+
+    def update(self, ticks) -> "BarBuilder":
+        """Fold a frame of ticks (pandas with timestamp index, or polars with a timestamp column) into the bars."""
+        if not isinstance(ticks, pd.DataFrame):
+            ticks = ticks.to_pandas().set_index("timestamp")
+        idx = ticks.index
+        self._datetime_index = isinstance(idx, pd.DatetimeIndex)
+        ts = idx.as_unit("ns").asi8 if self._datetime_index else np.asarray(idx, dtype=np.int64)
+        price = ticks["price"].to_numpy(dtype=np.float64)
+        volume = ticks["volume"].to_numpy(dtype=np.float64) if "volume" in ticks.columns else np.ones(len(price))
+        if isinstance(ticks["symbol"].dtype, pd.CategoricalDtype):
+            self._symbol_dtype = "category"
+
+        symbols, groups = symbol_groups(ticks["symbol"])
+        for sym, pos in zip(symbols, groups):
+            t = ts[pos]
+            if len(t) > 1 and (np.diff(t) < 0).any():
+                order = np.argsort(t, kind="stable")
+                pos, t = pos[order], t[order]
+            if sym in self._last_ts and t[0] < self._last_ts[sym]:
+                raise ValueError(f"ticks for {sym!r} go back in time across updates")
+            self._last_ts[sym] = int(t[-1])
+
+            p = price[pos]
+            v = volume[pos]
+            ticks_cols = {"open": p, "high": p, "low": p, "close": p,
+                          "count": np.ones(len(p), dtype=np.int64), "volume": v, "pv": p * v}
+            built: Dict[str, Dict[str, np.ndarray]] = {}
+            for f in self.freqs:
+                src = self._source[f]
+                start, cols = (t, ticks_cols) if src is None else (built[src]["start"], built[src])
+                built[f] = _rollup(start, cols, self._freq_ns[f])
+                stored = self._bars[f].setdefault(sym, {k: [] for k in ("start",) + FIELDS})
+                _merge_into(stored, built[f])
+        return self
+
+    def _frame(self, freq: str) -> pd.DataFrame:
+        parts = []
+        for sym, stored in self._bars[freq].items():
+            if not stored["start"]:
+                continue
+            cols = {k: np.concatenate(v) for k, v in stored.items()}
+            start = cols.pop("start")
+            index = pd.DatetimeIndex(start.view("datetime64[ns]")) if self._datetime_index else pd.Index(start)
+            df = pd.DataFrame({"symbol": sym, **cols, "price": cols["close"]}, index=index)
+            df.index.name = "timestamp"
+            parts.append(df)
+        if not parts:
+            return pd.DataFrame(columns=["symbol", *FIELDS, "price"])
+        out = merge_sorted_frames(parts)
+        if self._symbol_dtype == "category":
+            out["symbol"] = out["symbol"].astype("category")
+        return out
+
+    def bars(self, freq: Optional[str] = None):
+        if freq is not None:
+            return self._frame(freq)
+        return {f: self._frame(f) for f in self.freqs}
+
+
+def build_bars(ticks, freqs: Sequence[str] = DEFAULT_FREQS) -> Dict[str, pd.DataFrame]:
+    """One-shot form of BarBuilder: {freq: bars frame} for a tick frame."""
+    return BarBuilder(freqs).update(ticks).bars()
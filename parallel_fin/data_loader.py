@@ -1,8 +1,12 @@
 import time
-import psutil
+import numpy as np
 import pandas as pd
-import polars as pl
 import statistics
+from typing import Optional, TYPE_CHECKING
+
+# polars and psutil are imported on first use to keep `import` cheap.
+if TYPE_CHECKING:
+    import polars as pl
 
 
 # -----------------------------
@@ -14,6 +18,8 @@ def profile_memory(func):
     Returns a tuple: (result, metrics_dict)
     """
     def wrapper(*args, **kwargs):
+        import psutil
+
         process = psutil.Process()
         mem_before = process.memory_info().rss / (1024 ** 2)  # MB
         start = time.perf_counter()
@@ -30,13 +36,62 @@ def profile_memory(func):
     return wrapper
 
 
+# -----------------------------
+# Compact mode helpers
+# -----------------------------
+class SymbolDictionary:
+    """
+    Symbol <-> small integer code mapping shared between frames.
+
+    Codes are assigned in first-seen order (loaders feed symbols sorted, so a
+    fresh dictionary is alphabetical) and never change, so the same instance
+    can be passed to several loads to keep codes consistent. Rows with no
+    symbol get the reserved code MISSING (-1), which decodes to None.
+    """
+
+    MISSING = -1
+
+    def __init__(self, symbols=()):
+        self.symbols = []
+        self._codes = {}
+        self.extend(symbols)
+
+    def extend(self, symbols) -> None:
+        for sym in symbols:
+            if sym not in self._codes:
+                self._codes[sym] = len(self.symbols)
+                self.symbols.append(sym)
+        if len(self.symbols) > np.iinfo(np.int16).max:
+            raise ValueError("SymbolDictionary supports at most 32767 symbols")
+
+    def encode(self, values) -> np.ndarray:
+        self.extend(sorted(set(values)))
+        return np.fromiter((self._codes[v] for v in values), dtype=np.int16, count=len(values))
+
+    def decode(self, code: int) -> Optional[str]:
+        code = int(code)
+        if code == self.MISSING:
+            return None
+        if not 0 <= code < len(self.symbols):
+            raise KeyError(f"unknown symbol code {code}")
+        return self.symbols[code]
+
+    def __len__(self):
+        return len(self.symbols)
+
+
 # -----------------------------
 # Data loading functions
 # -----------------------------
-def load_market_data_pandas(csv_path: str) -> pd.DataFrame:
+def load_market_data_pandas(csv_path: str, compact: bool = False,
+                            symbols: Optional[SymbolDictionary] = None) -> pd.DataFrame:
     """
     Load market data using pandas.
     Expected columns: timestamp, symbol, price
+
+    compact=True stores symbols as int16 codes (dictionary in
+    df.attrs["symbols"]) and the index as int64 nanoseconds since the Unix
+    epoch instead of category / datetime64.
     """
     df = pd.read_csv(
         csv_path,
@@ -44,17 +99,48 @@ def load_market_data_pandas(csv_path: str) -> pd.DataFrame:
         dtype={"symbol": "category", "price": "float64"},
     )
     df = df.set_index("timestamp").sort_index()
+    if compact:
+        symbols = symbols if symbols is not None else SymbolDictionary()
+        cat = df["symbol"].cat
+        lookup = symbols.encode(list(cat.categories))
+        codes = cat.codes.to_numpy()
+        # category code -1 (missing symbol) must not index lookup from the end
+        df["symbol"] = np.where(codes >= 0, lookup[codes], symbols.MISSING).astype(np.int16)
+        df.index = pd.Index(df.index.as_unit("ns").asi8, name="timestamp")
+        df.attrs["symbols"] = symbols
     return df
 
 
-def load_market_data_polars(csv_path: str) -> pl.DataFrame:
+def load_market_data_polars(csv_path: str, compact: bool = False,
+                            symbols: Optional[SymbolDictionary] = None) -> "pl.DataFrame":
     """
     Load market data using polars.
     Expected columns: timestamp, symbol, price
+
+    compact=True stores symbols as Int16 codes and timestamps as Int64
+    nanoseconds since the Unix epoch. polars frames carry no metadata, so pass
+    a SymbolDictionary to get the code mapping back (or to share it with a
+    pandas load).
     """
+    import polars as pl
+
+    df = pl.read_csv(csv_path, try_parse_dates=True)
+    if compact:
+        symbols = symbols if symbols is not None else SymbolDictionary()
+        uniq = df["symbol"].drop_nulls().unique().sort().to_list()
+        codes = symbols.encode(uniq)
+        return (
+            df.with_columns([
+                pl.col("symbol").replace_strict(uniq, codes.tolist(), return_dtype=pl.Int16)
+                .fill_null(symbols.MISSING),
+                pl.col("price").cast(pl.Float64),
+                pl.col("timestamp").dt.epoch("ns"),
+            ])
+            .sort("timestamp")
+        )
+
     df = (
-        pl.read_csv(csv_path, try_parse_dates=True)
-        .with_columns([
+        df.with_columns([
             pl.col("symbol").cast(pl.Categorical),
             pl.col("price").cast(pl.Float64),
         ])
@@ -73,6 +159,8 @@ def compare_ingestion(csv_path: str, repeats: int = 3):
     Runs each loader multiple times, averages the results,
     and prints a clean summary table.
     """
+    import psutil
+
     pandas_times, pandas_mems = [], []
     polars_times, polars_mems = [], []
 
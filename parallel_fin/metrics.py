@@ -1,11 +1,15 @@
 import pandas as pd
 import numpy as np
+import re
 import time
-import psutil
-import polars as pl
-import matplotlib.pyplot as plt
-from parallel_fin import data_loader
-from typing import Dict
+import statistics
+from typing import Dict, List, Optional, Tuple, Union, TYPE_CHECKING
+from parallel_fin.kernels import count_window_starts, time_window_starts, rolling_mean_std
+
+# polars, psutil and matplotlib are imported on first use so that importing
+# this module (and every process-pool worker that does) stays cheap.
+if TYPE_CHECKING:
+    import polars as pl
 
 
 def profile_resources(func):
@@ -14,6 +18,8 @@ def profile_resources(func):
     Returns (result, metrics_dict)
     """
     def wrapper(*args, **kwargs):
+        import psutil
+
         process = psutil.Process()
         mem_before = process.memory_info().rss / (1024 ** 2)
         start = time.perf_counter()
@@ -45,42 +51,206 @@ def profile_resources(func):
     return wrapper
 
 
+# Columns added by the rolling kernels, in the order they are created.
+METRIC_COLUMNS = ["return", "ret_vol20", "ma20", "vol20", "sharpe20"]
+
+
+def symbol_groups(symbol) -> Tuple[list, List[np.ndarray]]:
+    """
+    Split row positions by symbol in one factorize + stable argsort.
+    Returns (symbols, positions) with positions in original row order per
+    symbol; rows with a missing symbol (NaN, or a negative compact-mode code,
+    see SymbolDictionary.MISSING) are left out.
+    """
+    codes, uniques = pd.factorize(symbol)
+    if uniques.dtype.kind == "i" and (uniques < 0).any():
+        missing = np.flatnonzero(uniques < 0)
+        remap = np.arange(len(uniques)) - np.searchsorted(missing, np.arange(len(uniques)))
+        remap[missing] = -1
+        codes = np.where(codes >= 0, remap[codes], -1)
+        uniques = uniques[uniques >= 0]
+    order = np.argsort(codes, kind="stable")
+    counts = np.bincount(codes[codes >= 0], minlength=len(uniques))
+    start = int((codes < 0).sum())
+    groups = np.split(order[start:], np.cumsum(counts)[:-1])
+    return list(uniques), groups
+
+
+_DURATION_NS = {"ns": 1, "us": 10**3, "ms": 10**6, "s": 10**9, "m": 60 * 10**9,
+                "h": 3600 * 10**9, "d": 86400 * 10**9, "w": 7 * 86400 * 10**9}
+_DURATION_RE = re.compile(r"(\d+)(ns|us|ms|s|m|h|d|w)")
+
+
+def _window_ns(window: Union[int, str]) -> Optional[int]:
+    """
+    Duration windows in ns; None for row-count windows. Accepts polars-style
+    strings ("15m", "1h30m", "1d") and anything pd.Timedelta parses ("15min").
+    """
+    if isinstance(window, str):
+        parts = _DURATION_RE.findall(window)
+        if parts and "".join(n + u for n, u in parts) == window:
+            ns = sum(int(n) * _DURATION_NS[u] for n, u in parts)
+        else:
+            ns = int(pd.Timedelta(window).value)
+        if ns <= 0:
+            raise ValueError(f"window must be a positive duration: {window!r}")
+        return ns
+    return None
+
+
+def timestamps_ns(timestamps) -> np.ndarray:
+    """int64 ns from a DatetimeIndex / datetime64 array, or int64 epoch ns (compact mode) as is."""
+    if isinstance(timestamps, pd.DatetimeIndex):
+        return timestamps.as_unit("ns").asi8
+    ts = np.asarray(timestamps)
+    return ts.astype("datetime64[ns]").view(np.int64) if ts.dtype.kind == "M" else ts.astype(np.int64, copy=False)
+
+
+def _rolling_group(prices: np.ndarray, window: Union[int, str], out: np.ndarray, positions,
+                   ts: Optional[np.ndarray] = None, engine: str = "pandas") -> None:
+    """
+    Rolling metrics for one symbol's time-ordered prices, scattered into out[:, positions].
+    Duration windows need the symbol's int64 ns timestamps in `ts`.
+    """
+    window_ns = _window_ns(window)
+    if engine == "pandas":
+        if window_ns is None:
+            s = pd.Series(prices, copy=False)
+            roll = window
+        else:
+            s = pd.Series(prices, index=pd.DatetimeIndex(ts.view("datetime64[ns]")), copy=False)
+            roll = pd.Timedelta(window_ns, unit="ns")
+        ret = s.pct_change()
+        ret_roll = ret.rolling(roll)
+        ret_mean, ret_std = ret_roll.mean().to_numpy(), ret_roll.std().to_numpy()
+        price_roll = s.rolling(roll)
+        price_mean, price_std = price_roll.mean().to_numpy(), price_roll.std().to_numpy()
+        ret = ret.to_numpy()
+    elif engine == "numpy":
+        if window_ns is None:
+            starts, min_periods = count_window_starts(len(prices), window), window
+        else:
+            starts, min_periods = time_window_starts(ts, window_ns), 1
+        ret = np.full(len(prices), np.nan)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            ret[1:] = prices[1:] / prices[:-1] - 1.0
+        ret_mean, ret_std = rolling_mean_std(ret, starts, min_periods)
+        price_mean, price_std = rolling_mean_std(prices, starts, min_periods)
+    else:
+        raise ValueError("engine must be 'pandas' or 'numpy'")
+    with np.errstate(divide="ignore", invalid="ignore"):
+        sharpe = ret_mean / ret_std
+    sharpe[np.isinf(sharpe)] = np.nan
+
+    out[0, positions] = ret
+    out[1, positions] = ret_std
+    out[2, positions] = price_mean
+    out[3, positions] = price_std
+    out[4, positions] = sharpe
+
+
+def rolling_metrics(price, symbol=None, window: Union[int, str] = 20, out: Optional[np.ndarray] = None,
+                    timestamps=None, engine: str = "pandas") -> Dict[str, np.ndarray]:
+    """
+    Pure form of compute_rolling_pandas: never modifies its inputs.
+
+    price and symbol are row-aligned arrays (symbol=None means one series);
+    rows must be time-ordered within each symbol. Returns {column: array}
+    for METRIC_COLUMNS, each aligned with the input rows. The arrays are rows
+    of one (len(METRIC_COLUMNS), n) float64 buffer; pass it back as `out` to
+    reuse it across calls.
+
+    window is a row count (20) or a duration ("15m", "1d") over the
+    row-aligned `timestamps`; duration windows cover (t - window, t] and
+    need a single observation (min_periods=1), as in pandas offset rolling.
+    engine="pandas" uses pandas rolling; engine="numpy" uses the two-pointer /
+    block-centred prefix-sum kernels in kernels.py (same NaN pattern; see
+    kernels.rolling_mean_std for accuracy).
+    """
+    p = np.asarray(price, dtype=np.float64)
+    shape = (len(METRIC_COLUMNS), len(p))
+    if out is None:
+        out = np.empty(shape, dtype=np.float64)
+    elif out.shape != shape or out.dtype != np.float64:
+        raise ValueError(f"out must be a float64 array of shape {shape}")
+    ts = None
+    if _window_ns(window) is not None:
+        if timestamps is None:
+            raise ValueError("duration windows need timestamps")
+        ts = timestamps_ns(timestamps)
+    out.fill(np.nan)
+
+    if symbol is None:
+        _rolling_group(p, window, out, slice(None), ts, engine)
+    else:
+        for positions in symbol_groups(symbol)[1]:
+            _rolling_group(p[positions], window, out, positions, None if ts is None else ts[positions], engine)
+    return dict(zip(METRIC_COLUMNS, out))
+
+
+def rolling_metrics_frame(df: pd.DataFrame, window: Union[int, str] = 20, out: Optional[np.ndarray] = None,
+                          engine: str = "pandas") -> pd.DataFrame:
+    """
+    rolling_metrics for a frame with 'symbol' and 'price' columns. Returns a
+    new frame holding only METRIC_COLUMNS on df.index, backed by `out`;
+    df itself is left untouched. Duration windows use df.index as timestamps.
+    """
+    if out is None:
+        out = np.empty((len(METRIC_COLUMNS), len(df)), dtype=np.float64)
+    rolling_metrics(df["price"].to_numpy(), df["symbol"], window, out, timestamps=df.index, engine=engine)
+    return pd.DataFrame(out.T, index=df.index, columns=METRIC_COLUMNS, copy=False)
+
+
 @profile_resources
-def compute_rolling_pandas(df: pd.DataFrame, window: int = 20) -> pd.DataFrame:
+def compute_rolling_pandas(df: pd.DataFrame, window: Union[int, str] = 20, compact: bool = False) -> pd.DataFrame:
     """
     Compute rolling metrics for each symbol using pandas.
     Metrics: moving average, std dev, and Sharpe ratio.
     Assumes df has columns ['symbol', 'price'] and datetime index.
-    """
-    # Percent returns per symbol
-    df["return"] = df.groupby("symbol")["price"].pct_change()
-
-    df["ret_vol20"] = df.groupby("symbol")["return"].transform(lambda x: x.rolling(window).std())
-
-    # Rolling calculations per symbol
-    df["ma20"] = df.groupby("symbol")["price"].transform(
-        lambda x: x.rolling(window).mean()
-    )
-    df["vol20"] = df.groupby("symbol")["price"].transform(
-        lambda x: x.rolling(window).std()
-    )
-    df["sharpe20"] = (
-        df.groupby("symbol")["return"]
-        .transform(lambda x: x.rolling(window).mean() / x.rolling(window).std())
-        .replace([np.inf, -np.inf], np.nan)
-    )
-
-
+    Adds the columns to df in place; use rolling_metrics / rolling_metrics_frame
+    to get them without touching df. window may be a row count or a
+    duration string ("15m", "1d") over the datetime index.
 
+    compact=True stores the derived columns as float32; all rolling sums are
+    still accumulated in float64 and only the results are narrowed.
+    """
+    cols = rolling_metrics(df["price"].to_numpy(), df["symbol"], window, timestamps=df.index)
+    dtype = np.float32 if compact else np.float64
+    for name, values in cols.items():
+        df[name] = values.astype(dtype, copy=False)
     return df
 
 @profile_resources
-def compute_rolling_polars(df: pl.DataFrame, window: int = 20) -> pl.DataFrame:
+def compute_rolling_polars(df: "pl.DataFrame", window: Union[int, str] = 20, compact: bool = False) -> "pl.DataFrame":
     """
     Compute rolling metrics per symbol using Polars.
     Metrics: moving average, std dev, Sharpe ratio (risk-free = 0).
     Assumes df has columns ['timestamp', 'symbol', 'price'].
+    Duration windows ("15m", "1d") use rolling_*_by over the timestamp column.
+
+    compact=True casts the derived columns to Float32 after the float64
+    computation, as in compute_rolling_pandas.
     """
+    import polars as pl
+
+    window_ns = _window_ns(window)
+    if window_ns is None:
+        def roll_mean(col):
+            return pl.col(col).rolling_mean(window_size=window)
+
+        def roll_std(col):
+            return pl.col(col).rolling_std(window_size=window)
+    else:
+        by = pl.col("timestamp")
+        if df.schema["timestamp"].is_integer():  # compact mode: int64 epoch ns
+            by = by.cast(pl.Datetime("ns"))
+        duration = f"{window_ns}ns"
+
+        def roll_mean(col):
+            return pl.col(col).rolling_mean_by(by, window_size=duration)
+
+        def roll_std(col):
+            return pl.col(col).rolling_std_by(by, window_size=duration)
 
     # Compute percent returns (grouped by symbol)
     df = df.with_columns(
@@ -88,18 +258,16 @@ def compute_rolling_polars(df: pl.DataFrame, window: int = 20) -> pl.DataFrame:
     )
 
     df = df.with_columns(
-        pl.col("return").rolling_std(window_size=window).over("symbol").alias("ret_vol20")
+        roll_std("return").over("symbol").alias("ret_vol20")
     )
 
 
     # Rolling mean and std for price per symbol
     df = df.with_columns([
-        pl.col("price")
-        .rolling_mean(window_size=window)
+        roll_mean("price")
         .over("symbol")
         .alias("ma20"),
-        pl.col("price")
-        .rolling_std(window_size=window)
+        roll_std("price")
         .over("symbol")
         .alias("vol20"),
     ])
@@ -107,17 +275,18 @@ def compute_rolling_polars(df: pl.DataFrame, window: int = 20) -> pl.DataFrame:
     # Rolling Sharpe ratio (mean of returns / std of returns)
     df = df.with_columns(
         (
-            (pl.col("return")
-             .rolling_mean(window_size=window)
+            (roll_mean("return")
              .over("symbol"))
             /
-            (pl.col("return")
-             .rolling_std(window_size=window)
+            (roll_std("return")
              .over("symbol"))
         )
         .alias("sharpe20")
     )
 
+    if compact:
+        df = df.with_columns([pl.col(c).cast(pl.Float32) for c in METRIC_COLUMNS])
+
     return df
 
 
@@ -127,6 +296,8 @@ def compare_rolling_performance(csv_path: str, window: int = 20, symbol: str = "
     """
     Compare pandas vs polars rolling performance and visualize results.
     """
+    import matplotlib.pyplot as plt
+    from parallel_fin import data_loader
 
     print("\n=== Rolling Metrics Performance ===")
 
@@ -134,8 +305,8 @@ def compare_rolling_performance(csv_path: str, window: int = 20, symbol: str = "
     pd_df, _ = data_loader.load_pandas(csv_path)
     pl_df, _ = data_loader.load_polars(csv_path)
 
-    # --- Compute pandas metrics ---
-    pd_result, pd_stats = compute_rolling_pandas(pd_df.copy(), window)
+    # --- Compute pandas metrics (pure API: pd_df is not modified, no copy needed) ---
+    pd_metrics, pd_stats = profile_resources(rolling_metrics_frame)(pd_df, window)
     print(f"Pandas:  {pd_stats}")
 
     # --- Compute polars metrics ---
@@ -154,12 +325,11 @@ def compare_rolling_performance(csv_path: str, window: int = 20, symbol: str = "
     print(summary.to_string(index=False))
 
     # --- Visualization for one symbol (AAPL) ---
-    df_plot = pd_result.reset_index()
-    df_plot = df_plot[df_plot["symbol"] == symbol]
+    mask = (pd_df["symbol"] == symbol).to_numpy()
 
     plt.figure(figsize=(10, 5))
-    plt.plot(df_plot["timestamp"], df_plot["price"], label="Price", alpha=0.6)
-    plt.plot(df_plot["timestamp"], df_plot["ma20"], label="20-period MA", linewidth=2)
+    plt.plot(pd_df.index[mask], pd_df["price"].to_numpy()[mask], label="Price", alpha=0.6)
+    plt.plot(pd_df.index[mask], pd_metrics["ma20"].to_numpy()[mask], label="20-period MA", linewidth=2)
     plt.title(f"{symbol} – Rolling Metrics (20 periods)")
     plt.xlabel("Time")
     plt.ylabel("Price")
@@ -169,6 +339,47 @@ def compare_rolling_performance(csv_path: str, window: int = 20, symbol: str = "
 
     return summary
 
+def compare_dtype_modes(csv_path: str, window: int = 20, repeats: int = 3):
+    """
+    Benchmark default vs compact dtype mode (pandas): load + rolling time and
+    resident frame size (memory_usage(deep=True)) after the metrics are added.
+    Also reports the largest relative float32 error per metric column.
+    """
+    from parallel_fin import data_loader
+
+    summary = {}
+    frames = {}
+    for mode, compact in (("default", False), ("compact", True)):
+        load_times, roll_times = [], []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            df = data_loader.load_market_data_pandas(csv_path, compact=compact)
+            load_times.append(time.perf_counter() - start)
+            df, stats = compute_rolling_pandas(df, window, compact=compact)
+            roll_times.append(stats["time_sec"])
+        frames[mode] = df
+        summary[mode] = {
+            "load_time_avg": round(statistics.mean(load_times), 4),
+            "rolling_time_avg": round(statistics.mean(roll_times), 4),
+            "frame_mb": round(float(df.memory_usage(deep=True).sum()) / (1024 ** 2), 4),
+        }
+
+    ref, cmp_ = frames["default"], frames["compact"]
+    summary["max_rel_error"] = {}
+    for col in METRIC_COLUMNS:
+        a = ref[col].to_numpy(dtype=np.float64)
+        b = cmp_[col].to_numpy(dtype=np.float64)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            rel = np.abs(a - b) / np.abs(a)
+        rel = rel[np.isfinite(rel)]
+        summary["max_rel_error"][col] = float(rel.max()) if rel.size else 0.0
+
+    print("\n=== Default vs Compact dtype mode (pandas) ===")
+    for mode in ("default", "compact"):
+        print(f"{mode:8s}: {summary[mode]}")
+    print(f"max relative error: {summary['max_rel_error']}")
+    return summary
+
 def pct_returns(prices: pd.Series) -> pd.Series:
     s = prices.sort_index().astype(float)
     return s.pct_change().dropna()
@@ -187,7 +398,16 @@ def max_drawdown(prices: pd.Series) -> float:
     return float(dd.min())
 
 def build_symbol_price_map_pandas(df: pd.DataFrame) -> Dict[str, pd.Series]:
+    """
+    Map symbol -> price series. Compact frames (symbol codes with a
+    SymbolDictionary in df.attrs["symbols"]) are decoded back to names; their
+    series keep the int64 epoch index.
+    """
     x = df.copy()
     if "timestamp" in x.columns:
         x = x.sort_values("timestamp").set_index("timestamp")
+    symbols = df.attrs.get("symbols")
+    if symbols is not None:
+        return {symbols.decode(code): g["price"].astype(float) for code, g in x.groupby("symbol")
+                if code != symbols.MISSING}
     return {sym: g["price"].astype(float) for sym, g in x.groupby("symbol")}
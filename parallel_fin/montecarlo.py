@@ -0,0 +1,114 @@
+"""
+montecarlo.py
+Monte Carlo value-at-risk and expected shortfall for every portfolio node.
+
+Joint returns are simulated from a Gaussian fitted to the historical
+percentage returns (the same pct_returns that rolling_return_volatility
+uses), in fixed-size vectorized batches. Each batch has its own child of a
+single SeedSequence, so results depend only on (seed, n_paths, batch_size)
+and not on how many processes run them. Node P&L comes from the
+ScenarioModel in scenarios.py. Only the worst ceil((1 - alpha) * n_paths)
+losses per node are kept while batches stream in, so memory is bounded by
+the tail size rather than the path count.
+"""
+import math
+import os
+from typing import Dict, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .metrics import pct_returns
+from .parallel import bounded_map, pool_state, process_pool_with_state
+from .scenarios import ScenarioModel
+
+
+def estimate_return_model(symbol_prices: Dict[str, pd.Series], symbols: Sequence[str],
+                          freq: Optional[str] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Mean vector and covariance matrix of joint returns for `symbols`.
+
+    Each symbol's prices are aligned on the union of timestamps (forward
+    filled, or resampled to `freq` for irregular ticks) and turned into
+    returns with pct_returns. Symbols without price history get zero mean
+    and variance, so their positions carry no simulated risk.
+    """
+    closes = {}
+    for sym in symbols:
+        s = symbol_prices.get(sym)
+        if s is None or s.empty:
+            continue
+        s = s.sort_index().groupby(level=0).last()
+        closes[sym] = s.resample(freq).last() if freq else s
+    mu = np.zeros(len(symbols))
+    cov = np.zeros((len(symbols), len(symbols)))
+    if not closes:
+        return mu, cov
+
+    aligned = pd.DataFrame(closes).ffill()
+    rets = pd.DataFrame({sym: pct_returns(aligned[sym].dropna()) for sym in aligned.columns})
+    idx = [i for i, sym in enumerate(symbols) if sym in rets.columns]
+    mu[idx] = rets.mean().to_numpy()
+    cov[np.ix_(idx, idx)] = np.nan_to_num(rets.cov().to_numpy())
+    return mu, cov
+
+
+def _loading(cov: np.ndarray) -> np.ndarray:
+    """Factor L with L @ L.T == cov, tolerant of singular or slightly non-PSD input."""
+    w, v = np.linalg.eigh(cov)
+    return v * np.sqrt(np.clip(w, 0.0, None))
+
+
+def _worst(losses: np.ndarray, k: int) -> np.ndarray:
+    """The k largest losses in each column (unordered)."""
+    if len(losses) <= k:
+        return losses
+    return np.partition(losses, len(losses) - k, axis=0)[len(losses) - k:]
+
+
+def _simulate_tail(model: ScenarioModel, loading: np.ndarray, mu: np.ndarray,
+                   seed: np.random.SeedSequence, n: int, k: int) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    returns = mu + rng.standard_normal((n, loading.shape[1])) @ loading.T
+    return _worst(-model.pnl(returns), k)
+
+
+def _tail_chunk_worker(seed: np.random.SeedSequence, n: int, k: int) -> np.ndarray:
+    return _simulate_tail(pool_state("model"), pool_state("loading"), pool_state("mu"), seed, n, k)
+
+
+def monte_carlo_var_es(model: ScenarioModel, mu: np.ndarray, cov: np.ndarray, n_paths: int = 100_000,
+                       alpha: float = 0.99, batch_size: int = 10_000, seed: int = 0,
+                       max_workers: Optional[int] = 1) -> pd.DataFrame:
+    """
+    One-period VaR and ES (positive numbers = losses) at confidence `alpha`
+    for every node of `model`, indexed by node path.
+
+    VaR is the k-th worst simulated loss and ES the mean of the k worst,
+    with k = ceil((1 - alpha) * n_paths). Batches run in a process pool when
+    max_workers != 1 (None = all cores).
+    """
+    if not 0.0 < alpha < 1.0:
+        raise ValueError("alpha must be in (0, 1)")
+    k = max(1, math.ceil((1.0 - alpha) * n_paths))
+    sizes = [min(batch_size, n_paths - start) for start in range(0, n_paths, batch_size)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    loading = _loading(cov)
+
+    tail = np.empty((0, len(model.node_paths)))
+    if max_workers == 1 or len(sizes) < 2:
+        for s, n in zip(seeds, sizes):
+            tail = _worst(np.vstack([tail, _simulate_tail(model, loading, mu, s, n, k)]), k)
+    else:
+        workers = max_workers or os.cpu_count() or 1
+        with process_pool_with_state(workers, model=model, loading=loading, mu=mu) as ex:
+            tasks = ((i, (s, n, k)) for i, (s, n) in enumerate(zip(seeds, sizes)))
+            done = 0
+            for _, chunk in bounded_map(ex, _tail_chunk_worker, tasks, 2 * workers):
+                tail = _worst(np.vstack([tail, chunk]), k)
+                done += 1
+        if done != len(sizes):
+            raise RuntimeError(f"{len(sizes) - done} of {len(sizes)} Monte Carlo batches failed")
+
+    tail = np.sort(tail, axis=0)
+    return pd.DataFrame({"var": tail[0], "es": tail.mean(axis=0)}, index=pd.Index(model.node_paths, name="node"))
@@ -1,118 +1,298 @@
+import os
 import pandas as pd
-import polars as pl
-from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
-from .metrics import compute_rolling_pandas, compute_rolling_polars
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed, wait, FIRST_COMPLETED
+from .metrics import compute_rolling_polars
+from .metrics import METRIC_COLUMNS, rolling_metrics, symbol_groups, timestamps_ns
 from .metrics import profile_resources 
-from dataclasses import dataclass
-from typing import Dict, Any, List, Optional, Tuple
+from typing import Dict, Any, Iterable, Iterator, List, Optional, Tuple, Union
 import numpy as np
-from .metrics import rolling_return_volatility, max_drawdown, build_symbol_price_map_pandas
+# Position workers live in the numpy-only kernels module, so a spawned worker
+# unpickling its task imports parallel_fin.kernels and nothing heavier.
+from .kernels import PositionMetrics, position_worker
 
 
 
 
-def compute_symbol_metrics(df_for_one_symbol, lib: str = "pandas", window: int = 20):
+def compute_symbol_metrics(df_for_one_symbol, lib: str = "pandas", window: Union[int, str] = 20):
     """
     Compute rolling metrics for a single symbol using the selected library.
     Supports both pandas and polars.
     """
     if lib == "pandas":
-        res, _ = compute_rolling_pandas(df_for_one_symbol, window)
+        # non-mutating: the caller's slice is never written to, so no defensive copy
+        cols = rolling_metrics(df_for_one_symbol["price"].to_numpy(), df_for_one_symbol["symbol"], window,
+                               timestamps=df_for_one_symbol.index)
+        res = df_for_one_symbol.assign(**cols)
     elif lib == "polars":
-        pl_df = pl.from_pandas(df_for_one_symbol)
-        res, _ = compute_rolling_polars(pl_df, window)
-        res = res.to_pandas()
+        import polars as pl
+
+        if isinstance(window, str):
+            # duration windows need the timestamps as a column on the polars side
+            pl_df = pl.from_pandas(df_for_one_symbol.rename_axis("timestamp").reset_index())
+            res, _ = compute_rolling_polars(pl_df, window)
+            res = res.to_pandas().set_index("timestamp")
+        else:
+            pl_df = pl.from_pandas(df_for_one_symbol)
+            res, _ = compute_rolling_polars(pl_df, window)
+            res = res.to_pandas()
     else:
         raise ValueError("lib must be 'pandas' or 'polars'")
     return res
 
 
 
-@profile_resources
-def run_threaded(df_all: pd.DataFrame, lib: str = "pandas", window: int = 20, max_workers: int = 4):
+def _iter_symbol_slices(df_all: pd.DataFrame) -> Iterator[Tuple[Any, pd.DataFrame]]:
+    """Yield (symbol, sub-frame) pairs lazily, one groupby pass over df_all."""
+    for sym, sub_df in df_all.groupby("symbol", observed=True, sort=False):
+        yield sym, sub_df
+
+
+def bounded_map(executor, fn, items: Iterable[Tuple[Any, tuple]], max_in_flight: int) -> Iterator[Tuple[Any, Any]]:
     """
-    Compute rolling metrics for all symbols in parallel using threads.
-    Each thread processes one symbol subset.
+    Submit fn(*args) for each (key, args) with at most max_in_flight pending
+    futures, yielding (key, result) as tasks complete. New work is only
+    pulled from `items` when a slot frees up, so neither inputs nor outputs
+    pile up in memory. Failed tasks are reported and skipped.
     """
+    items = iter(items)
+    pending = {}
+    exhausted = False
+    while pending or not exhausted:
+        while not exhausted and len(pending) < max_in_flight:
+            try:
+                key, args = next(items)
+            except StopIteration:
+                exhausted = True
+                break
+            pending[executor.submit(fn, *args)] = key
+        if not pending:
+            break
+        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+        for fut in done:
+            key = pending.pop(fut)
+            try:
+                yield key, fut.result()
+            except Exception as e:
+                print(f"Error in {key}: {e}")
+
+
+# Read-only state shared by every task of a pool, installed once per worker
+# process by the pool initializer so tasks only pickle their own inputs.
+_POOL_STATE: Dict[str, Any] = {}
+
+
+def _init_pool_state(state: Dict[str, Any]) -> None:
+    _POOL_STATE.clear()
+    _POOL_STATE.update(state)
+
+
+def process_pool_with_state(max_workers: Optional[int] = None, **state) -> ProcessPoolExecutor:
+    """ProcessPoolExecutor whose workers can read `state` back with pool_state(name)."""
+    return ProcessPoolExecutor(max_workers=max_workers, initializer=_init_pool_state, initargs=(state,))
 
-    symbols = df_all["symbol"].unique()
-    results = []
 
-    def worker(symbol):
-        sub_df = df_all[df_all["symbol"] == symbol].copy()
-        return compute_symbol_metrics(sub_df, lib, window)
+def pool_state(name: str) -> Any:
+    """Look up state installed by process_pool_with_state, from inside a worker task."""
+    return _POOL_STATE[name]
 
+
+def iter_threaded(df_all: pd.DataFrame, lib: str = "pandas", window: Union[int, str] = 20, max_workers: int = 4,
+                  max_in_flight: Optional[int] = None) -> Iterator[Tuple[Any, pd.DataFrame]]:
+    """
+    Streaming form of run_threaded: yield (symbol, metrics_df) as each symbol
+    finishes, keeping at most max_in_flight (default 2 * max_workers) symbols
+    submitted at once.
+    """
+    max_in_flight = max_in_flight or 2 * max_workers
+    tasks = ((sym, (sub_df, lib, window)) for sym, sub_df in _iter_symbol_slices(df_all))
     with ThreadPoolExecutor(max_workers=max_workers) as executor:
-        futures = {executor.submit(worker, sym): sym for sym in symbols}
-        for fut in as_completed(futures):
-            symbol = futures[fut]
-            try:
-                results.append(fut.result())
-            except Exception as e:
-                print(f"Error in {symbol}: {e}")
+        yield from bounded_map(executor, compute_symbol_metrics, tasks, max_in_flight)
 
-    combined = pd.concat(results).sort_index()
-    return combined
 
+def iter_multiprocess(df_all: pd.DataFrame, lib: str = "pandas", window: Union[int, str] = 20, max_workers: int = 4,
+                      max_in_flight: Optional[int] = None) -> Iterator[Tuple[Any, pd.DataFrame]]:
+    """
+    Streaming form of run_multiprocess. Only the symbol's own slice is
+    pickled to the worker, and at most max_in_flight slices are outstanding.
+    """
+    max_in_flight = max_in_flight or 2 * max_workers
+    tasks = ((sym, (sub_df, lib, window)) for sym, sub_df in _iter_symbol_slices(df_all))
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        yield from bounded_map(executor, compute_symbol_metrics, tasks, max_in_flight)
 
 
-def worker_process(symbol, df_all, lib, window):
+def _merge_order(keys: List[np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
     """
-    Worker function executed in a separate process.
+    Stable k-way merge of sorted key arrays by pairwise searchsorted merges.
+    Returns (merged_keys, dest) where dest[j] is the output row of row j of
+    the concatenated inputs.
     """
-    sub_df = df_all[df_all["symbol"] == symbol].copy()
-    return compute_symbol_metrics(sub_df, lib, window)
+    offsets = np.cumsum([0] + [len(k) for k in keys[:-1]])
+    runs = [(k, np.arange(len(k)) + off) for k, off in zip(keys, offsets)]
+    while len(runs) > 1:
+        merged = []
+        for (ka, pa), (kb, pb) in zip(runs[0::2], runs[1::2]):
+            pos_a = np.searchsorted(kb, ka, side="left") + np.arange(len(ka))
+            pos_b = np.searchsorted(ka, kb, side="right") + np.arange(len(kb))
+            k = np.empty(len(ka) + len(kb), dtype=np.result_type(ka, kb))
+            p = np.empty(len(k), dtype=np.int64)
+            k[pos_a], k[pos_b] = ka, kb
+            p[pos_a], p[pos_b] = pa, pb
+            merged.append((k, p))
+        if len(runs) % 2:
+            merged.append(runs[-1])
+        runs = merged
+    merged_keys, order = runs[0]
+    dest = np.empty(len(order), dtype=np.int64)
+    dest[order] = np.arange(len(order))
+    return merged_keys, dest
 
 
-@profile_resources
-def run_multiprocess(df_all: pd.DataFrame, lib: str = "pandas", window: int = 20, max_workers: int = 4):
+def merge_sorted_frames(frames: List[pd.DataFrame]) -> pd.DataFrame:
     """
-    Compute rolling metrics for all symbols using multiple processes.
-    Each process works independently on one symbol.
+    Combine frames that are each sorted by index (and share columns) into one
+    index-ordered frame. Output rows come from pairwise merges of the sorted
+    indexes (stable: ties keep the order of `frames`), and each frame's
+    columns are written straight into preallocated output columns, so peak
+    memory is the inputs plus one output (no intermediate concat or gather).
     """
+    live = [i for i, f in enumerate(frames) if len(f)]
+    if not live:
+        return pd.DataFrame()
+    first = frames[live[0]]
+    columns = list(first.columns)
+    if any(list(frames[i].columns) != columns for i in live):
+        raise ValueError("merge_sorted_frames needs frames with the same columns")
+    index_name = first.index.name
+    index_dtypes = {frames[i].index.dtype for i in live}
+    merged_keys, dest = _merge_order([frames[i].index.to_numpy() for i in live])
 
-    symbols = df_all["symbol"].unique()
-    results = []
+    n = len(dest)
+    out: Dict[Any, np.ndarray] = {}
+    categories: Dict[Any, pd.Index] = {}
+    extension: Dict[Any, Any] = {}
+    for c in columns:
+        dtypes = [frames[i][c].dtype for i in live]
+        if all(isinstance(d, pd.CategoricalDtype) for d in dtypes):
+            cats = dtypes[0].categories
+            for d in dtypes[1:]:
+                cats = cats.append(d.categories[~d.categories.isin(cats)])
+            categories[c] = cats
+            out[c] = np.empty(n, dtype=np.int32)
+            continue
+        try:
+            out[c] = np.empty(n, dtype=np.result_type(*dtypes))
+        except TypeError:  # extension dtypes (e.g. pandas strings): fill as object, restore below
+            out[c] = np.empty(n, dtype=object)
+            if len(set(dtypes)) == 1:
+                extension[c] = dtypes[0]
 
-    with ProcessPoolExecutor(max_workers=max_workers) as executor:
-        futures = {executor.submit(worker_process, sym, df_all, lib, window): sym for sym in symbols}
-        for fut in as_completed(futures):
-            symbol = futures[fut]
-            try:
-                results.append(fut.result())
-            except Exception as e:
-                print(f"Error in {symbol}: {e}")
+    start = 0
+    for i in live:
+        frame = frames[i]
+        rows = dest[start:start + len(frame)]
+        start += len(frame)
+        for c in columns:
+            col = frame[c]
+            if c in categories:
+                recode = categories[c].get_indexer(col.cat.categories)
+                codes = col.cat.codes.to_numpy()
+                out[c][rows] = np.where(codes >= 0, recode[codes], -1)
+            else:
+                out[c][rows] = col.to_numpy()
 
-    combined = pd.concat(results).sort_index()
-    return combined
+    data = {}
+    for c in columns:
+        if c in categories:
+            data[c] = pd.Categorical.from_codes(out.pop(c), categories=categories[c])
+        elif c in extension:
+            data[c] = pd.array(out.pop(c), dtype=extension[c])
+        else:
+            data[c] = out.pop(c)
+    index_dtype = index_dtypes.pop() if len(index_dtypes) == 1 else None
+    index = pd.Index(merged_keys, dtype=index_dtype, name=index_name)
+    return pd.DataFrame(data, index=index, columns=columns, copy=False)
 
-@dataclass
-class PositionMetrics:
-    symbol: str
-    quantity: float
-    value: float
-    volatility: float
-    drawdown: float
 
-def _pack_series(s: Optional[pd.Series]) -> Optional[List[Tuple[pd.Timestamp, float]]]:
+def write_partitioned(results: Iterable[Tuple[Any, pd.DataFrame]], out_dir, fmt: str = "parquet") -> List[str]:
+    """
+    Incremental on-disk sink: write each (symbol, frame) as it arrives to
+    out_dir/symbol=<symbol>/part-0.<fmt> (hive-style, readable with
+    pd.read_parquet(out_dir) or polars.scan_parquet). fmt is "parquet"
+    (needs pyarrow) or "csv". Returns the written paths.
+    """
+    if fmt not in ("parquet", "csv"):
+        raise ValueError("fmt must be 'parquet' or 'csv'")
+    paths = []
+    for sym, frame in results:
+        part_dir = os.path.join(out_dir, f"symbol={sym}")
+        os.makedirs(part_dir, exist_ok=True)
+        path = os.path.join(part_dir, f"part-0.{fmt}")
+        frame = frame.drop(columns=["symbol"], errors="ignore")
+        if fmt == "parquet":
+            frame.to_parquet(path)
+        else:
+            frame.to_csv(path)
+        paths.append(path)
+    return paths
+
+
+def _metrics_block_worker(prices: np.ndarray, window, timestamps: Optional[np.ndarray] = None) -> np.ndarray:
+    """Rolling metrics for one symbol's prices as a (len(METRIC_COLUMNS), n) block."""
+    out = np.empty((len(METRIC_COLUMNS), len(prices)), dtype=np.float64)
+    rolling_metrics(prices, window=window, out=out, timestamps=timestamps)
+    return out
+
+
+def _run_arrays(executor_cls, df_all: pd.DataFrame, window: Union[int, str], max_workers: int) -> pd.DataFrame:
+    """
+    Array path for lib="pandas": workers get a float64 price array per symbol
+    (never a DataFrame slice) and their blocks are scattered into one
+    preallocated buffer aligned with df_all's rows.
+    """
+    price = df_all["price"].to_numpy(dtype=np.float64)
+    ts = timestamps_ns(df_all.index) if isinstance(window, str) else None
+    symbols, groups = symbol_groups(df_all["symbol"])
+    positions = dict(zip(symbols, groups))
+    out = np.full((len(METRIC_COLUMNS), len(price)), np.nan)
+
+    tasks = ((sym, (price[pos], window, None if ts is None else ts[pos])) for sym, pos in positions.items())
+    with executor_cls(max_workers=max_workers) as executor:
+        for sym, block in bounded_map(executor, _metrics_block_worker, tasks, 2 * max_workers):
+            out[:, positions[sym]] = block
+    return df_all.assign(**dict(zip(METRIC_COLUMNS, out)))
+
+
+@profile_resources
+def run_threaded(df_all: pd.DataFrame, lib: str = "pandas", window: Union[int, str] = 20, max_workers: int = 4):
+    """
+    Compute rolling metrics for all symbols in parallel using threads.
+    Each thread processes one symbol subset.
+    """
+    if lib == "pandas":
+        return _run_arrays(ThreadPoolExecutor, df_all, window, max_workers)
+    results = dict(iter_threaded(df_all, lib, window, max_workers))
+    # merge in first-appearance order so ties resolve the same way on every run
+    return merge_sorted_frames([results[sym] for sym in df_all["symbol"].unique() if sym in results])
+
+
+
+@profile_resources
+def run_multiprocess(df_all: pd.DataFrame, lib: str = "pandas", window: Union[int, str] = 20, max_workers: int = 4):
+    """
+    Compute rolling metrics for all symbols using multiple processes.
+    Each process works independently on one symbol.
+    """
+    if lib == "pandas":
+        return _run_arrays(ProcessPoolExecutor, df_all, window, max_workers)
+    results = dict(iter_multiprocess(df_all, lib, window, max_workers))
+    # merge in first-appearance order so ties resolve the same way on every run
+    return merge_sorted_frames([results[sym] for sym in df_all["symbol"].unique() if sym in results])
+
+def pack_series(s: Optional[pd.Series]) -> Optional[np.ndarray]:
     if s is None or s.empty:
         return None
-    return list(zip(s.index.to_pydatetime(), s.tolist()))
-
-def _position_worker(args: Tuple[str, float, Optional[List[Tuple[pd.Timestamp, float]]], Optional[float], int]) -> PositionMetrics:
-    symbol, quantity, packed, fallback_price, vol_window = args
-    if packed:
-        idx, vals = zip(*packed)
-        prices = pd.Series(vals, index=pd.to_datetime(idx), dtype=float)
-        latest = float(prices.iloc[-1])
-        vol = rolling_return_volatility(prices, window=vol_window)
-        dd = max_drawdown(prices)
-        value = quantity * latest
-    else:
-        latest = float(fallback_price) if fallback_price is not None else float("nan")
-        value = quantity * latest if not np.isnan(latest) else float("nan")
-        vol, dd = float("nan"), float("nan")
-    return PositionMetrics(symbol, float(quantity), float(value), float(vol), float(dd))
+    return s.sort_index().to_numpy(dtype=np.float64)
 
 @profile_resources
 def compute_positions_multiprocess(
@@ -121,18 +301,18 @@ def compute_positions_multiprocess(
     vol_window: int = 20,
     max_workers: Optional[int] = None,
 ) -> List[PositionMetrics]:
-    tasks: List[Tuple[str, float, Optional[List[Tuple[pd.Timestamp, float]]], Optional[float], int]] = []
+    tasks: List[Tuple[str, float, Optional[np.ndarray], Optional[float], int]] = []
     for pos in positions_spec:
         sym = pos["symbol"]
         qty = float(pos.get("quantity", 0.0))
         fallback = pos.get("price")
         s = symbol_prices.get(sym)
-        tasks.append((sym, qty, _pack_series(s), fallback, vol_window))
+        tasks.append((sym, qty, pack_series(s), fallback, vol_window))
 
     out: List[PositionMetrics] = []
     if tasks:
         with ProcessPoolExecutor(max_workers=max_workers) as ex:
-            futs = [ex.submit(_position_worker, t) for t in tasks]
+            futs = [ex.submit(position_worker, t) for t in tasks]
             for f in as_completed(futs):
                 out.append(f.result())
         order = {pos["symbol"]: idx for idx, pos in enumerate(positions_spec)}
@@ -1,8 +1,11 @@
 from typing import Any, Dict, List, Tuple, Optional
 import math
+import os
 import numpy as np
 import pandas as pd
-from .parallel import compute_positions_multiprocess, PositionMetrics
+from .parallel import compute_positions_multiprocess, PositionMetrics, pack_series, bounded_map
+from .parallel import pool_state, process_pool_with_state
+from .kernels import position_worker
 from .metrics import build_symbol_price_map_pandas
 
 def _weighted_average(pairs: List[Tuple[float, float]]) -> float:
@@ -68,3 +71,249 @@ def aggregate_portfolio_multiprocessing(node: Dict[str, Any], symbol_prices: Dic
         "positions": [{"symbol": p.symbol, "value": p.value, "volatility": p.volatility, "drawdown": p.drawdown} for p in pm_list],
         "sub_portfolios": sub_aggs,
     }
+
+def precompute_symbol_stats(symbol_prices: Dict[str, pd.Series], vol_window: int = 20) -> Dict[str, PositionMetrics]:
+    """
+    Compute latest price, volatility and drawdown once per symbol.
+    Stored as unit-quantity PositionMetrics so value == latest price.
+    """
+    # empty series are skipped so positions fall back to their own "price", as in the sequential path
+    return {sym: position_worker((sym, 1.0, pack_series(s), None, vol_window))
+            for sym, s in symbol_prices.items() if s is not None and not s.empty}
+
+def _position_from_stats(pos: Dict[str, Any], symbol_stats: Dict[str, PositionMetrics]) -> PositionMetrics:
+    sym = pos["symbol"]
+    qty = float(pos.get("quantity", 0.0))
+    st = symbol_stats.get(sym)
+    if st is None:
+        return position_worker((sym, qty, None, pos.get("price"), 0))
+    return PositionMetrics(sym, qty, qty * st.value, st.volatility, st.drawdown)
+
+def aggregate_portfolio_precomputed(node: Dict[str, Any], symbol_stats: Dict[str, PositionMetrics]) -> Dict[str, Any]:
+    """Same result as aggregate_portfolio_sequential, using precompute_symbol_stats output."""
+    positions_spec = node.get("positions", []) or []
+    subs_spec = node.get("sub_portfolios", []) or []
+
+    pm_list = [_position_from_stats(pos, symbol_stats) for pos in positions_spec]
+    sub_aggs = [aggregate_portfolio_precomputed(sub, symbol_stats) for sub in subs_spec]
+
+    total_value, agg_vol, max_dd = _combine_node(pm_list, sub_aggs)
+
+    return {
+        "name": node.get("name", "Unnamed"),
+        "total_value": total_value,
+        "aggregate_volatility": agg_vol,
+        "max_drawdown": max_dd,
+        "positions": [{"symbol": p.symbol, "value": p.value, "volatility": p.volatility, "drawdown": p.drawdown} for p in pm_list],
+        "sub_portfolios": sub_aggs,
+    }
+
+
+# -----------------------------
+# Batch evaluation of many trees
+# -----------------------------
+def _flatten_trees(trees: List[Dict[str, Any]], sym_idx: Dict[str, int]) -> Dict[str, Any]:
+    """Stack trees into pre-order node and position arrays (global node ids)."""
+    names: List[str] = []
+    parent: List[int] = []
+    depth: List[int] = []
+    pos_node: List[int] = []
+    pos_sym: List[int] = []
+    pos_symbol: List[str] = []
+    pos_qty: List[float] = []
+    pos_fallback: List[float] = []
+    roots: List[int] = []
+
+    def visit(node: Dict[str, Any], par: int, d: int) -> None:
+        idx = len(names)
+        names.append(node.get("name", "Unnamed"))
+        parent.append(par)
+        depth.append(d)
+        for pos in node.get("positions", []) or []:
+            sym = pos["symbol"]
+            price = pos.get("price")
+            pos_node.append(idx)
+            pos_sym.append(sym_idx.get(sym, -1))
+            pos_symbol.append(sym)
+            pos_qty.append(float(pos.get("quantity", 0.0)))
+            pos_fallback.append(float(price) if price is not None else float("nan"))
+        for sub in node.get("sub_portfolios", []) or []:
+            visit(sub, idx, d + 1)
+
+    for tree in trees:
+        roots.append(len(names))
+        visit(tree, -1, 0)
+    return {
+        "names": names, "parent": np.asarray(parent, dtype=np.int64), "depth": np.asarray(depth, dtype=np.int64),
+        "roots": roots, "pos_node": np.asarray(pos_node, dtype=np.int64), "pos_sym": np.asarray(pos_sym, dtype=np.int64),
+        "pos_symbol": pos_symbol, "pos_qty": np.asarray(pos_qty, dtype=np.float64),
+        "pos_fallback": np.asarray(pos_fallback, dtype=np.float64),
+    }
+
+
+def _evaluate_stacked(flat: Dict[str, Any], stats: np.ndarray) -> List[Dict[str, Any]]:
+    """
+    Evaluate stacked trees with array ops. stats is (n_symbols, 3):
+    latest price, volatility, drawdown. Mirrors _combine_node: nodes are
+    reduced level by level from the deepest, so every child is final before
+    it is folded into its parent.
+    """
+    n_nodes = len(flat["names"])
+    node, sym = flat["pos_node"], flat["pos_sym"]
+    known = sym >= 0
+    safe = np.where(known, sym, 0)
+    latest = np.where(known, stats[safe, 0], flat["pos_fallback"])
+    value = flat["pos_qty"] * latest
+    vol = np.where(known, stats[safe, 1], np.nan)
+    dd = np.where(known, stats[safe, 2], np.nan)
+
+    total = np.bincount(node, weights=np.nan_to_num(value), minlength=n_nodes)
+    ok = ~np.isnan(value) & ~np.isnan(vol)
+    wsum = np.bincount(node[ok], weights=value[ok], minlength=n_nodes)
+    wvsum = np.bincount(node[ok], weights=value[ok] * vol[ok], minlength=n_nodes)
+    node_dd = np.full(n_nodes, np.inf)
+    ok = ~np.isnan(dd)
+    np.minimum.at(node_dd, node[ok], dd[ok])
+    node_vol = np.full(n_nodes, np.nan)
+
+    parent, depth = flat["parent"], flat["depth"]
+    for d in range(int(depth.max()) if n_nodes else -1, -1, -1):
+        level = np.flatnonzero(depth == d)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            node_vol[level] = np.where(wsum[level] > 0, wvsum[level] / wsum[level], np.nan)
+        if d == 0:
+            break
+        par = parent[level]
+        np.add.at(total, par, total[level])
+        ok = (total[level] > 0) & ~np.isnan(node_vol[level])
+        np.add.at(wsum, par[ok], total[level][ok])
+        np.add.at(wvsum, par[ok], total[level][ok] * node_vol[level][ok])
+        np.minimum.at(node_dd, par, node_dd[level])
+    node_dd[np.isinf(node_dd)] = np.nan
+
+    # rebuild the nested result dicts in pre-order
+    positions: List[List[Dict[str, Any]]] = [[] for _ in range(n_nodes)]
+    for i, n in enumerate(node.tolist()):
+        positions[n].append({"symbol": flat["pos_symbol"][i], "value": float(value[i]),
+                             "volatility": float(vol[i]), "drawdown": float(dd[i])})
+    results: List[Dict[str, Any]] = []
+    for i in range(n_nodes):
+        res = {
+            "name": flat["names"][i],
+            "total_value": float(total[i]),
+            "aggregate_volatility": float(node_vol[i]),
+            "max_drawdown": float(node_dd[i]),
+            "positions": positions[i],
+            "sub_portfolios": [],
+        }
+        results.append(res)
+        if parent[i] >= 0:
+            results[parent[i]]["sub_portfolios"].append(res)
+    return [results[r] for r in flat["roots"]]
+
+
+def _error_entry(e: Exception) -> Dict[str, str]:
+    return {"error": f"{type(e).__name__}: {e}"}
+
+
+def _evaluate_trees(trees: List[Dict[str, Any]], sym_idx: Dict[str, int], stats: np.ndarray) -> List[Dict[str, Any]]:
+    """Evaluate a chunk of trees stacked together; fall back to one at a time to isolate bad trees."""
+    try:
+        return _evaluate_stacked(_flatten_trees(trees, sym_idx), stats)
+    except Exception:
+        out = []
+        for tree in trees:
+            try:
+                out.extend(_evaluate_stacked(_flatten_trees([tree], sym_idx), stats))
+            except Exception as e:
+                out.append(_error_entry(e))
+        return out
+
+
+def _batch_chunk_worker(trees: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    return _evaluate_trees(trees, pool_state("sym_idx"), pool_state("stats"))
+
+
+def _scan_tree(node: Any, symbols: set) -> int:
+    """
+    Add the symbols held anywhere in a tree to `symbols` and return its
+    position count. Raises on shapes _flatten_trees cannot stack, so bad
+    trees are caught one at a time before the batch is built.
+    """
+    if not isinstance(node, dict):
+        raise TypeError(f"portfolio node must be a dict, not {type(node).__name__}")
+    positions = list(node.get("positions", []) or [])
+    for pos in positions:
+        if not isinstance(pos, dict):
+            raise TypeError(f"position must be a dict, not {type(pos).__name__}")
+        symbols.add(pos["symbol"])
+    return len(positions) + sum(_scan_tree(sub, symbols) for sub in node.get("sub_portfolios", []) or [])
+
+
+def _split_by_positions(counts: List[int], n_chunks: int) -> List[Tuple[int, int]]:
+    """Contiguous [start, end) ranges of trees holding roughly equal position counts."""
+    counts = np.cumsum([max(c, 1) for c in counts])
+    bounds = np.searchsorted(counts, counts[-1] * np.arange(1, n_chunks) / n_chunks, side="left") + 1
+    edges = np.unique(np.concatenate(([0], bounds, [len(counts)])))
+    return [(int(a), int(b)) for a, b in zip(edges[:-1], edges[1:]) if b > a]
+
+
+def aggregate_portfolios_batch(
+    trees: List[Dict[str, Any]],
+    symbol_prices: Dict[str, pd.Series],
+    vol_window: int = 20,
+    max_workers: Optional[int] = 1,
+    chunks_per_worker: int = 4,
+) -> List[Dict[str, Any]]:
+    """
+    Evaluate many portfolio trees against one price snapshot.
+
+    Per-symbol stats are computed once for the union of symbols held, then
+    all trees are stacked into flat arrays and evaluated together. With
+    max_workers != 1 (None = all cores) the trees are split into contiguous
+    chunks of roughly equal position count across a process pool. Results
+    come back in input order with the same structure as
+    aggregate_portfolio_sequential; a tree that cannot be evaluated yields
+    {"error": "..."} without affecting the others.
+    """
+    results: List[Dict[str, Any]] = [None] * len(trees)
+    held: set = set()
+    good: List[int] = []
+    counts: List[int] = []
+    for i, tree in enumerate(trees):
+        symbols: set = set()
+        try:
+            counts.append(_scan_tree(tree, symbols))
+        except Exception as e:
+            results[i] = _error_entry(e)
+            continue
+        held |= symbols
+        good.append(i)
+    if not good:
+        return results
+    valid = [trees[i] for i in good]
+
+    symbol_stats = precompute_symbol_stats(
+        {sym: symbol_prices[sym] for sym in held if sym in symbol_prices}, vol_window=vol_window
+    )
+    symbols = sorted(symbol_stats)
+    sym_idx = {sym: i for i, sym in enumerate(symbols)}
+    stats = np.array([[symbol_stats[s].value, symbol_stats[s].volatility, symbol_stats[s].drawdown] for s in symbols],
+                     dtype=np.float64).reshape(-1, 3)
+
+    workers = max_workers or os.cpu_count() or 1
+    if workers == 1:
+        evaluated = _evaluate_trees(valid, sym_idx, stats)
+    else:
+        ranges = _split_by_positions(counts, workers * chunks_per_worker)
+        out: List[Any] = [None] * len(ranges)
+        with process_pool_with_state(workers, sym_idx=sym_idx, stats=stats) as ex:
+            tasks = ((i, (valid[a:b],)) for i, (a, b) in enumerate(ranges))
+            for i, chunk in bounded_map(ex, _batch_chunk_worker, tasks, 2 * workers):
+                out[i] = chunk
+        evaluated = []
+        for (a, b), chunk in zip(ranges, out):
+            evaluated.extend(chunk if chunk is not None else [{"error": "worker failed"}] * (b - a))
+    for i, res in zip(good, evaluated):
+        results[i] = res
+    return results
@@ -1,12 +1,10 @@
 import pandas as pd
-import matplotlib.pyplot as plt
-from tabulate import tabulate
 from parallel_fin.metrics import profile_resources
-from parallel_fin.portfolio import aggregate_portfolio_sequential, aggregate_portfolio_multiprocessing
 import json
 import math
+import os
 import numpy as np
-from typing import Any
+from typing import Any, Dict, Iterator, Optional, Tuple
 
 
 
@@ -17,11 +15,15 @@ def summarize_performance(results_dict):
 
 
 def print_performance_table(summary_df):
+    from tabulate import tabulate
+
     print("\n=== Performance Summary ===")
     print(tabulate(summary_df, headers="keys", tablefmt="github", floatfmt=".4f"))
 
 
 def plot_performance(summary_df):
+    import matplotlib.pyplot as plt
+
     metrics = ["time_sec", "mem_diff_mb", "cpu_percent"]
     titles = ["Execution Time (s)", "Memory Usage Δ (MB)", "CPU Utilization (%)"]
 
@@ -37,31 +39,202 @@ def plot_performance(summary_df):
 
 @profile_resources
 def time_portfolio_seq(portfolio_tree, sym_prices, vol_window=20):
+    from parallel_fin.portfolio import aggregate_portfolio_sequential
+
     return aggregate_portfolio_sequential(portfolio_tree, sym_prices, vol_window=vol_window)
 
 @profile_resources
 def time_portfolio_mp(portfolio_tree, sym_prices, vol_window=20, max_workers=None):
+    from parallel_fin.portfolio import aggregate_portfolio_multiprocessing
+
     return aggregate_portfolio_multiprocessing(
         portfolio_tree, sym_prices, vol_window=vol_window, max_workers=max_workers
     )
 
-def _nan_to_none(obj: Any):
+def time_portfolio_batch(trees, sym_prices, vol_window=20, max_workers=1):
+    """Profile aggregate_portfolios_batch; metrics gain trees_per_sec."""
+    from parallel_fin.portfolio import aggregate_portfolios_batch
+
+    results, metrics = profile_resources(aggregate_portfolios_batch)(
+        trees, sym_prices, vol_window=vol_window, max_workers=max_workers
+    )
+    metrics["trees_per_sec"] = round(len(trees) / metrics["time_sec"], 1) if metrics["time_sec"] > 0 else float("inf")
+    return results, metrics
+
+def nan_to_none(obj: Any):
     if isinstance(obj, float) and (math.isnan(obj) or math.isinf(obj)):
         return None
     if isinstance(obj, dict):
-        return {k: _nan_to_none(v) for k, v in obj.items()}
+        return {k: nan_to_none(v) for k, v in obj.items()}
     if isinstance(obj, list):
-        return [_nan_to_none(v) for v in obj]
+        return [nan_to_none(v) for v in obj]
     return obj
 
-def save_portfolio_json(obj: Any, path):
-    """Write portfolio hierarchy to JSON, converting NaN/inf to null."""
-    clean = _nan_to_none(obj)
-    with open(path, "w", encoding="utf-8") as f:
-        json.dump(clean, f, indent=2, ensure_ascii=False)
+def _json_scalar(v: Any) -> str:
+    if v is None:
+        return "null"
+    if isinstance(v, bool):
+        return "true" if v else "false"
+    if isinstance(v, float):
+        return "null" if (math.isnan(v) or math.isinf(v)) else float.__repr__(v)
+    if isinstance(v, int):
+        return int.__repr__(v)
+    if isinstance(v, str):
+        return json.dumps(v, ensure_ascii=False)
+    if isinstance(v, np.generic):
+        return _json_scalar(v.item())
+    raise TypeError(f"Object of type {type(v).__name__} is not JSON serializable")
+
+
+def _flat_value(v: Any) -> Any:
+    if isinstance(v, np.generic):
+        v = v.item()
+    if isinstance(v, float) and (math.isnan(v) or math.isinf(v)):
+        return None
+    return v
+
+
+def _flat_record(obj: Any) -> Optional[Dict[str, Any]]:
+    """Return a NaN-cleaned copy of a dict holding only scalars, or None if it nests containers."""
+    if not isinstance(obj, dict):
+        return None
+    out = {}
+    for k, v in obj.items():
+        if isinstance(v, (dict, list, tuple, Iterator)):
+            return None
+        out[k] = _flat_value(v)
+    return out
+
+
+def _encode_flat(obj: Any, indent: Optional[int], level: int) -> Optional[str]:
+    """
+    Encode a position dict, or a list of them, in one json.dumps call.
+    Returns None when obj has nested containers and must be walked instead.
+    """
+    if isinstance(obj, dict):
+        clean = _flat_record(obj)
+    elif isinstance(obj, (list, tuple)):
+        clean = [_flat_record(v) for v in obj]
+        if any(v is None for v in clean):
+            return None
+    else:
+        return None
+    if clean is None:
+        return None
+    text = json.dumps(clean, indent=indent, ensure_ascii=False)
+    if indent and level:
+        # json.dumps escapes newlines inside strings, so every "\n" here is layout
+        text = text.replace("\n", "\n" + " " * (indent * level))
+    return text
+
+
+def iter_portfolio_json(obj: Any, indent: Optional[int] = 2, _level: int = 0) -> Iterator[str]:
+    """
+    Yield the JSON text of a portfolio hierarchy piece by piece, mapping
+    NaN/inf to null as values are emitted. Output is identical to
+    json.dumps(nan_to_none(obj), indent=indent, ensure_ascii=False) but no
+    cleaned copy of the tree is ever built; position dicts and position
+    lists are encoded in one step each.
+
+    Any list in the tree (typically "sub_portfolios") may instead be an
+    iterator of finished sub-trees, which is consumed as it is written so
+    the caller never has to hold the whole result in memory.
+    """
+    flat = _encode_flat(obj, indent, _level)
+    if flat is not None:
+        yield flat
+        return
+    if isinstance(obj, dict):
+        items, open_, close = obj.items(), "{", "}"
+    elif isinstance(obj, (list, tuple, Iterator)):
+        items, open_, close = obj, "[", "]"
+    else:
+        yield _json_scalar(obj)
+        return
+
+    if indent is None:
+        inner, outer, sep, colon = "", "", ", ", ": "
+    else:
+        inner = "\n" + " " * (indent * (_level + 1))
+        outer = "\n" + " " * (indent * _level)
+        sep, colon = ",", ": "
 
-def save_portfolio_json(obj: Any, path):
-    """Write portfolio hierarchy to JSON, converting NaN/inf to null."""
-    clean = _nan_to_none(obj)
+    n = 0
+    for n, item in enumerate(items, 1):
+        yield (open_ if n == 1 else sep) + inner
+        if open_ == "{":
+            key, item = item
+            yield json.dumps(str(key), ensure_ascii=False) + colon
+        yield from iter_portfolio_json(item, indent, _level + 1)
+    yield outer + close if n else open_ + close
+
+
+def save_portfolio_json(obj: Any, path, indent: Optional[int] = 2, buffer_size: int = 1 << 16):
+    """
+    Stream portfolio hierarchy to JSON, converting NaN/inf to null.
+    Chunks are joined and written about buffer_size characters at a time.
+    """
     with open(path, "w", encoding="utf-8") as f:
-        json.dump(clean, f, indent=2, ensure_ascii=False)
+        buf, size = [], 0
+        for chunk in iter_portfolio_json(obj, indent):
+            buf.append(chunk)
+            size += len(chunk)
+            if size >= buffer_size:
+                f.write("".join(buf))
+                buf, size = [], 0
+        f.write("".join(buf))
+
+
+def portfolio_to_tables(obj: Any) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Flatten one aggregated tree (or a list of trees) into two tables:
+    nodes (node_id, parent_id, depth, name, total_value, aggregate_volatility,
+    max_drawdown) and positions (node_id, symbol, value, volatility, drawdown).
+    Node ids follow pre-order; roots have parent_id -1.
+    """
+    nodes: Dict[str, list] = {k: [] for k in ("node_id", "parent_id", "depth", "name", "total_value", "aggregate_volatility", "max_drawdown")}
+    positions: Dict[str, list] = {k: [] for k in ("node_id", "symbol", "value", "volatility", "drawdown")}
+
+    stack = [(root, -1, 0) for root in reversed(obj if isinstance(obj, list) else [obj])]
+    while stack:
+        node, parent, depth = stack.pop()
+        node_id = len(nodes["node_id"])
+        nodes["node_id"].append(node_id)
+        nodes["parent_id"].append(parent)
+        nodes["depth"].append(depth)
+        nodes["name"].append(node.get("name"))
+        for k in ("total_value", "aggregate_volatility", "max_drawdown"):
+            v = node.get(k)
+            nodes[k].append(float("nan") if v is None else v)
+        for p in node.get("positions", []) or []:
+            positions["node_id"].append(node_id)
+            positions["symbol"].append(p.get("symbol"))
+            for k in ("value", "volatility", "drawdown"):
+                v = p.get(k)
+                positions[k].append(float("nan") if v is None else v)
+        stack.extend((sub, node_id, depth + 1) for sub in reversed(node.get("sub_portfolios", []) or []))
+
+    nodes_df = pd.DataFrame(nodes).astype({"node_id": "int64", "parent_id": "int64", "depth": "int32",
+                                           "total_value": "float64", "aggregate_volatility": "float64", "max_drawdown": "float64"})
+    positions_df = pd.DataFrame(positions).astype({"node_id": "int64", "value": "float64",
+                                                   "volatility": "float64", "drawdown": "float64"})
+    return nodes_df, positions_df
+
+
+def save_portfolio_columnar(obj: Any, out_dir, fmt: str = "parquet") -> Tuple[str, str]:
+    """
+    Write the flattened node/position tables as Parquet (or Arrow IPC with
+    fmt="feather"), so consumers can read column subsets without parsing the
+    JSON document. Requires pyarrow. Returns (nodes_path, positions_path).
+    """
+    if fmt not in ("parquet", "feather"):
+        raise ValueError("fmt must be 'parquet' or 'feather'")
+    os.makedirs(out_dir, exist_ok=True)
+    nodes_df, positions_df = portfolio_to_tables(obj)
+    paths = (os.path.join(out_dir, f"nodes.{fmt}"), os.path.join(out_dir, f"positions.{fmt}"))
+    for df, path in zip((nodes_df, positions_df), paths):
+        if fmt == "parquet":
+            df.to_parquet(path, index=False)
+        else:
+            df.to_feather(path)
+    return paths
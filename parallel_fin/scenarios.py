@@ -0,0 +1,176 @@
+"""
+scenarios.py
+Vectorized stress testing over the portfolio tree.
+
+The tree is flattened once into a symbols x nodes matrix of direct
+exposures (market value held directly in each node, nodes in pre-order).
+A scenarios x symbols matrix of returns is then applied with one matrix
+multiply, and P&L is rolled up the hierarchy with segment sums: in pre-order
+every subtree is a contiguous run of nodes, so a node's total is a
+difference of two cumulative sums.
+"""
+import os
+from dataclasses import dataclass
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .parallel import bounded_map, pool_state, process_pool_with_state
+
+
+@dataclass
+class ScenarioModel:
+    symbols: List[str]
+    node_paths: List[str]
+    parent: np.ndarray        # (N,) parent node index, -1 for the root
+    subtree_end: np.ndarray   # (N,) exclusive end of each node's subtree in pre-order
+    exposure: np.ndarray      # (S, N) value held directly in each node per symbol
+    base_value: np.ndarray    # (N,) total value of each node's subtree
+
+    def pnl(self, shocks: np.ndarray) -> np.ndarray:
+        """P&L (scenarios x nodes) for a scenarios x symbols matrix of returns."""
+        direct = shocks @ self.exposure
+        cs = np.zeros((direct.shape[0], direct.shape[1] + 1), dtype=np.float64)
+        np.cumsum(direct, axis=1, out=cs[:, 1:])
+        return cs[:, self.subtree_end] - cs[:, :-1]
+
+
+def build_scenario_model(tree: Dict[str, Any], symbol_prices: Dict[str, pd.Series]) -> ScenarioModel:
+    """
+    Flatten a portfolio tree into a ScenarioModel. Position values follow
+    aggregate_portfolio_sequential (quantity x latest price, falling back to
+    the position's own "price"); positions with no usable price carry zero
+    exposure.
+    """
+    latest = {sym: float(s.sort_index().iloc[-1]) for sym, s in symbol_prices.items() if not s.empty}
+
+    paths: List[str] = []
+    parents: List[int] = []
+    holdings: List[Dict[str, float]] = []
+    ends: List[int] = []
+
+    def visit(node: Dict[str, Any], parent: int, prefix: str) -> None:
+        idx = len(paths)
+        path = f"{prefix}/{node.get('name', 'Unnamed')}" if prefix else node.get("name", "Unnamed")
+        paths.append(path)
+        parents.append(parent)
+        ends.append(-1)
+        direct: Dict[str, float] = {}
+        for pos in node.get("positions", []) or []:
+            sym = pos["symbol"]
+            price = latest.get(sym, pos.get("price"))
+            value = float(pos.get("quantity", 0.0)) * float(price) if price is not None else float("nan")
+            if not np.isnan(value):
+                direct[sym] = direct.get(sym, 0.0) + value
+        holdings.append(direct)
+        for sub in node.get("sub_portfolios", []) or []:
+            visit(sub, idx, path)
+        ends[idx] = len(paths)
+
+    visit(tree, -1, "")
+
+    symbols = sorted({sym for h in holdings for sym in h})
+    col = {sym: i for i, sym in enumerate(symbols)}
+    exposure = np.zeros((len(symbols), len(paths)), dtype=np.float64)
+    for n, h in enumerate(holdings):
+        for sym, value in h.items():
+            exposure[col[sym], n] = value
+
+    subtree_end = np.asarray(ends, dtype=np.int64)
+    cs = np.concatenate([[0.0], np.cumsum(exposure.sum(axis=0))])
+    base_value = cs[subtree_end] - cs[:-1]
+    return ScenarioModel(symbols, paths, np.asarray(parents, dtype=np.int64), subtree_end, exposure, base_value)
+
+
+# -----------------------------
+# Shock matrix builders
+# -----------------------------
+def align_shocks(shocks, symbols: Sequence[str]) -> np.ndarray:
+    """
+    Turn a scenarios x symbols DataFrame into a float64 matrix whose columns
+    follow `symbols` (missing symbols get a zero shock). ndarrays are passed
+    through after a shape check.
+    """
+    if isinstance(shocks, pd.DataFrame):
+        return shocks.reindex(columns=list(symbols), fill_value=0.0).to_numpy(dtype=np.float64)
+    arr = np.asarray(shocks, dtype=np.float64)
+    if arr.ndim != 2 or arr.shape[1] != len(symbols):
+        raise ValueError(f"shocks must have shape (n_scenarios, {len(symbols)})")
+    return arr
+
+
+def sector_shocks(sector_moves: pd.DataFrame, sector_of: Dict[str, str], symbols: Sequence[str]) -> np.ndarray:
+    """
+    Expand scenarios x sectors moves to scenarios x symbols via a one-hot
+    sector map. Symbols with no sector (or an unshocked sector) get zero.
+    """
+    mapping = np.zeros((sector_moves.shape[1], len(symbols)), dtype=np.float64)
+    sector_idx = {sec: i for i, sec in enumerate(sector_moves.columns)}
+    for j, sym in enumerate(symbols):
+        i = sector_idx.get(sector_of.get(sym))
+        if i is not None:
+            mapping[i, j] = 1.0
+    return sector_moves.to_numpy(dtype=np.float64) @ mapping
+
+
+def historical_shocks(symbol_prices: Dict[str, pd.Series], symbols: Sequence[str], freq: str = "1D") -> pd.DataFrame:
+    """
+    Replay historical periods: one scenario per `freq` bucket holding each
+    symbol's close-to-close return (0 where a symbol has no data that day).
+    Needs datetime-indexed price series.
+    """
+    closes = {sym: symbol_prices[sym].sort_index().resample(freq).last() for sym in symbols if sym in symbol_prices}
+    if not closes:
+        return pd.DataFrame(columns=list(symbols), dtype=np.float64)
+    rets = pd.DataFrame(closes).ffill().pct_change().iloc[1:]
+    return rets.reindex(columns=list(symbols)).fillna(0.0)
+
+
+# -----------------------------
+# Chunked / parallel execution
+# -----------------------------
+def _pnl_chunk_worker(shocks: np.ndarray) -> np.ndarray:
+    return pool_state("model").pnl(shocks)
+
+
+def iter_scenario_pnl(model: ScenarioModel, shocks, chunk_size: int = 1024,
+                      max_workers: Optional[int] = 1) -> Iterator[Tuple[int, np.ndarray]]:
+    """
+    Yield (first_scenario_row, pnl_chunk) for chunks of at most chunk_size
+    scenarios, in completion order. With max_workers > 1 (or None for all
+    cores) chunks run in a process pool that holds the model once per worker;
+    at most 2 * workers chunks are in flight. Raises RuntimeError after the
+    last chunk if any chunk failed, so no scenario is silently left out.
+    """
+    shocks = align_shocks(shocks, model.symbols)
+    starts = range(0, shocks.shape[0], chunk_size)
+    if max_workers == 1 or len(starts) < 2:
+        for start in starts:
+            yield start, model.pnl(shocks[start:start + chunk_size])
+        return
+
+    workers = max_workers or os.cpu_count() or 1
+    with process_pool_with_state(workers, model=model) as ex:
+        tasks = ((start, (shocks[start:start + chunk_size],)) for start in starts)
+        done = 0
+        for start, chunk in bounded_map(ex, _pnl_chunk_worker, tasks, 2 * workers):
+            yield start, chunk
+            done += 1
+    if done != len(starts):
+        raise RuntimeError(f"{len(starts) - done} of {len(starts)} scenario chunks failed")
+
+
+def run_scenarios(model: ScenarioModel, shocks, chunk_size: int = 1024, max_workers: Optional[int] = 1,
+                  index: Optional[Sequence[Any]] = None) -> pd.DataFrame:
+    """
+    P&L of every node under every scenario as a scenarios x node-paths frame.
+    DataFrame shocks lend their index to the result unless `index` is given.
+    """
+    if index is None and isinstance(shocks, pd.DataFrame):
+        index = shocks.index
+    n = len(shocks)
+    out = np.full((n, len(model.node_paths)), np.nan)
+    for start, chunk in iter_scenario_pnl(model, shocks, chunk_size, max_workers):
+        out[start:start + len(chunk)] = chunk
+    return pd.DataFrame(out, index=index, columns=model.node_paths)
@@ -0,0 +1,242 @@
+"""
+service.py
+Long-running aggregation service.
+
+Loads market data once, precomputes per-symbol stats and keeps a worker pool
+warm, then answers portfolio aggregation requests over a Unix socket or a
+localhost TCP port. Both speak two protocols, told apart by the first line of
+a connection:
+
+- newline-delimited JSON: each request line is a portfolio tree (dict) or a
+  batch (list of trees), and each response line is the aggregated result;
+- HTTP/1.1: POST /aggregate with the tree or batch as the JSON body, so curl
+  and any HTTP client work (one request per connection).
+
+Results have the same shape save_portfolio_json writes (NaN/inf -> null).
+Errors come back as {"error": "..."} (HTTP 400 for bad requests, else 500).
+
+Run with:
+    python -m parallel_fin.service --csv data/market_data-1.csv --socket /tmp/parallel_fin.sock
+    curl --unix-socket /tmp/parallel_fin.sock -d @tree.json http://localhost/aggregate
+"""
+import argparse
+import asyncio
+import json
+import os
+import re
+import socket
+from concurrent.futures import ProcessPoolExecutor, wait
+from typing import Any, Dict, List, Optional, Tuple
+
+from .parallel import pool_state, process_pool_with_state
+from .portfolio import aggregate_portfolio_precomputed, precompute_symbol_stats
+from .reporting import nan_to_none
+
+_HTTP_REQUEST_LINE = re.compile(rb"[A-Z]+ \S+ HTTP/1\.[01]\r?\n")
+_HTTP_REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+                 500: "Internal Server Error"}
+
+
+def _warm_up() -> None:
+    """No-op task: submitting one per worker makes the pool start its processes."""
+
+
+def _aggregate_batch_in_worker(trees: List[Dict[str, Any]]) -> List[Any]:
+    # the symbol stats are installed once per worker, so batch tasks only pickle the trees
+    symbol_stats = pool_state("symbol_stats")
+    return [nan_to_none(aggregate_portfolio_precomputed(t, symbol_stats)) for t in trees]
+
+
+class AggregationService:
+    """
+    Warm state shared by all clients: precomputed symbol stats, a process
+    pool for batches, and a table of in-flight requests used to coalesce
+    identical concurrent requests into one computation.
+    """
+
+    def __init__(self, symbol_prices, vol_window: int = 20, max_workers: Optional[int] = None, batch_chunk: int = 64):
+        self.vol_window = vol_window
+        self.batch_chunk = batch_chunk
+        self.symbol_stats = precompute_symbol_stats(symbol_prices, vol_window=vol_window)
+        self._max_workers = max_workers
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.computed = 0  # number of non-coalesced computations, for tests/monitoring
+
+    @classmethod
+    def from_csv(cls, csv_path: str, **kwargs) -> "AggregationService":
+        from .data_loader import load_market_data_pandas
+        from .metrics import build_symbol_price_map_pandas
+
+        df = load_market_data_pandas(csv_path)
+        return cls(build_symbol_price_map_pandas(df), **kwargs)
+
+    # -----------------------------
+    # Pool lifecycle
+    # -----------------------------
+    def start_pool(self) -> None:
+        """
+        Start the worker processes now rather than on the first batch, so
+        process start-up and the symbol_stats hand-off happen before serving.
+        """
+        if self._pool is None and self._max_workers != 0:
+            workers = self._max_workers or os.cpu_count() or 1
+            self._pool = process_pool_with_state(workers, symbol_stats=self.symbol_stats)
+            wait([self._pool.submit(_warm_up) for _ in range(workers)])
+
+    def close(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+    # -----------------------------
+    # Request handling
+    # -----------------------------
+    async def aggregate(self, payload: Any) -> Any:
+        """Aggregate one tree or a batch, coalescing identical in-flight requests."""
+        key = json.dumps(payload, sort_keys=True, separators=(",", ":"))
+        task = self._inflight.get(key)
+        if task is None:
+            # the computation is its own task, so cancelling any one caller
+            # (including the first) never strands the others waiting on it
+            task = asyncio.ensure_future(self._compute(payload))
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._finish(key, t))
+        return await asyncio.shield(task)
+
+    def _finish(self, key: str, task: asyncio.Future) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            task.exception()  # mark retrieved when every caller has gone away
+
+    def _aggregate_local(self, trees: List[Dict[str, Any]]) -> List[Any]:
+        return [nan_to_none(aggregate_portfolio_precomputed(t, self.symbol_stats)) for t in trees]
+
+    async def _compute(self, payload: Any) -> Any:
+        self.computed += 1
+        loop = asyncio.get_running_loop()
+        if isinstance(payload, dict):
+            # single trees are cheap against precomputed stats; a thread keeps the loop responsive
+            return (await loop.run_in_executor(None, self._aggregate_local, [payload]))[0]
+        if not isinstance(payload, list) or not all(isinstance(t, dict) for t in payload):
+            raise ValueError("request must be a portfolio tree or a list of trees")
+
+        chunks = [payload[i:i + self.batch_chunk] for i in range(0, len(payload), self.batch_chunk)]
+        if self._pool is None or len(chunks) < 2:
+            return await loop.run_in_executor(None, self._aggregate_local, payload)
+        parts = await asyncio.gather(*(loop.run_in_executor(self._pool, _aggregate_batch_in_worker, c) for c in chunks))
+        return [r for part in parts for r in part]
+
+    async def _handle_http(self, request_line: bytes, reader: asyncio.StreamReader,
+                           writer: asyncio.StreamWriter) -> Tuple[int, Any]:
+        """Read the rest of one HTTP request and return (status, JSON response body)."""
+        method, target, _ = request_line.decode("latin-1").split(" ", 2)
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        if headers.get("expect", "").lower() == "100-continue":
+            # curl sends this for bodies over 1 MB and otherwise waits ~1 s before sending
+            writer.write(b"HTTP/1.1 100 Continue\r\n\r\n")
+            await writer.drain()
+        try:
+            body = await reader.readexactly(int(headers.get("content-length", 0)))
+        except (ValueError, asyncio.IncompleteReadError):
+            return 400, {"error": "missing or invalid request body"}
+
+        if target.split("?", 1)[0] != "/aggregate":
+            return 404, {"error": f"unknown path {target}; use POST /aggregate"}
+        if method != "POST":
+            return 405, {"error": "use POST /aggregate"}
+        try:
+            return 200, await self.aggregate(json.loads(body))
+        except (ValueError, TypeError) as e:  # includes json.JSONDecodeError
+            return 400, {"error": f"{type(e).__name__}: {e}"}
+        except Exception as e:
+            return 500, {"error": f"{type(e).__name__}: {e}"}
+
+    async def _handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                if _HTTP_REQUEST_LINE.fullmatch(line):
+                    status, response = await self._handle_http(line, reader, writer)
+                    body = json.dumps(response, ensure_ascii=False).encode("utf-8")
+                    writer.write(
+                        f"HTTP/1.1 {status} {_HTTP_REASONS[status]}\r\n"
+                        f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n"
+                        "Connection: close\r\n\r\n".encode("latin-1") + body
+                    )
+                    await writer.drain()
+                    break
+                try:
+                    response = await self.aggregate(json.loads(line))
+                except Exception as e:
+                    response = {"error": f"{type(e).__name__}: {e}"}
+                writer.write(json.dumps(response, ensure_ascii=False).encode("utf-8") + b"\n")
+                await writer.drain()
+        finally:
+            writer.close()
+
+    async def serve(self, socket_path: Optional[str] = None, host: str = "127.0.0.1", port: int = 8765,
+                    ready: Optional[asyncio.Event] = None) -> None:
+        """
+        Serve until cancelled. Uses a Unix socket if socket_path is given,
+        else localhost TCP; either accepts JSON lines or HTTP POST /aggregate.
+        """
+        self.start_pool()
+        if socket_path:
+            server = await asyncio.start_unix_server(self._handle_client, path=socket_path, limit=2 ** 26)
+        else:
+            server = await asyncio.start_server(self._handle_client, host=host, port=port, limit=2 ** 26)
+        try:
+            async with server:
+                if ready is not None:
+                    ready.set()
+                await server.serve_forever()
+        finally:
+            self.close()
+
+
+def request_aggregation(payload: Any, socket_path: Optional[str] = None, host: str = "127.0.0.1", port: int = 8765) -> Any:
+    """Blocking client helper: send one request and return the decoded response."""
+    if socket_path:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.connect(socket_path)
+    else:
+        sock = socket.create_connection((host, port))
+    with sock, sock.makefile("rwb") as f:
+        f.write(json.dumps(payload).encode("utf-8") + b"\n")
+        f.flush()
+        response = json.loads(f.readline())
+    if isinstance(response, dict) and set(response) == {"error"}:
+        raise RuntimeError(response["error"])
+    return response
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Warm portfolio aggregation service")
+    parser.add_argument("--csv", required=True, help="market data CSV (timestamp, symbol, price)")
+    parser.add_argument("--socket", help="Unix socket path (default: localhost TCP)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--vol-window", type=int, default=20)
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args(argv)
+
+    service = AggregationService.from_csv(args.csv, vol_window=args.vol_window, max_workers=args.workers)
+    print(f"Loaded {len(service.symbol_stats)} symbols; serving on {args.socket or f'{args.host}:{args.port}'}")
+    try:
+        asyncio.run(service.serve(socket_path=args.socket, host=args.host, port=args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
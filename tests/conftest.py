@@ -0,0 +1,37 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def portfolio_tree():
+    """data/portfolio_structure-1.json: AAPL and MSFT at the root, SPY in an "Index Holdings" sub-portfolio."""
+    with open(os.path.join(REPO_ROOT, "data", "portfolio_structure-1.json")) as f:
+        return json.load(f)
+
+
+@pytest.fixture
+def linear_prices():
+    """10 daily prices: AAPL rises 100 -> 110, MSFT falls 300 -> 280. No SPY history."""
+    dates = pd.date_range("2020-01-01", periods=10)
+    return {
+        "AAPL": pd.Series(np.linspace(100, 110, 10), index=dates),
+        "MSFT": pd.Series(np.linspace(300, 280, 10), index=dates),
+    }
+
+
+@pytest.fixture
+def random_prices():
+    """250 daily prices of two correlated random walks, AAPL and MSFT. No SPY history."""
+    rng = np.random.default_rng(3)
+    dates = pd.date_range("2020-01-01", periods=250)
+    common = rng.normal(0, 0.01, 250)
+    return {
+        "AAPL": pd.Series(170 * np.exp(np.cumsum(common + rng.normal(0, 0.01, 250))), index=dates),
+        "MSFT": pd.Series(320 * np.exp(np.cumsum(common + rng.normal(0, 0.005, 250))), index=dates),
+    }
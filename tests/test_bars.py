@@ -0,0 +1,66 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from parallel_fin import metrics
+from parallel_fin.bars import BarBuilder, build_bars
+
+
+def make_ticks(n=5000, seed=0):
+    rng = np.random.default_rng(seed)
+    idx = pd.Timestamp("2024-01-01") + pd.to_timedelta(np.sort(rng.integers(0, 3 * 86400 * 10**3, n)), unit="ms")
+    df = pd.DataFrame({
+        "symbol": pd.Categorical(rng.choice(["AAPL", "MSFT", "SPY"], n)),
+        "price": 100 + rng.normal(0, 0.1, n).cumsum(),
+        "volume": rng.integers(1, 100, n).astype(float),
+    }, index=pd.DatetimeIndex(idx, name="timestamp"))
+    return df
+
+
+def expected_bars(ticks, freq, sym):
+    t = ticks[ticks["symbol"] == sym]
+    r = t["price"].resample(freq)
+    out = pd.DataFrame({
+        "open": r.first(), "high": r.max(), "low": r.min(), "close": r.last(),
+        "count": r.count(), "volume": t["volume"].resample(freq).sum(),
+        "pv": (t["price"] * t["volume"]).resample(freq).sum(),
+    })
+    return out[out["count"] > 0]
+
+
+@pytest.mark.parametrize("freq", ["1min", "5min", "1h", "1D"])
+def test_bars_match_resample(freq):
+    ticks = make_ticks()
+    bars = build_bars(ticks)[freq]
+    assert bars.index.is_monotonic_increasing
+    for sym in ["AAPL", "MSFT", "SPY"]:
+        got = bars[bars["symbol"] == sym][["open", "high", "low", "close", "count", "volume", "pv"]]
+        exp = expected_bars(ticks, freq, sym)
+        np.testing.assert_array_equal(got.index.to_numpy(), exp.index.to_numpy())
+        np.testing.assert_allclose(got.to_numpy(dtype=float), exp.to_numpy(dtype=float), rtol=1e-12)
+
+
+def test_incremental_updates_match_one_shot():
+    ticks = make_ticks()
+    builder = BarBuilder(["1min", "5min", "1h", "1D", "7min"])
+    for chunk in np.array_split(np.arange(len(ticks)), 7):
+        builder.update(ticks.iloc[chunk])
+    one_shot = build_bars(ticks, ["1min", "5min", "1h", "1D", "7min"])
+    for freq, frame in builder.bars().items():
+        a = frame.reset_index().sort_values(["timestamp", "symbol"]).reset_index(drop=True)
+        b = one_shot[freq].reset_index().sort_values(["timestamp", "symbol"]).reset_index(drop=True)
+        pd.testing.assert_frame_equal(a, b, rtol=1e-12)
+
+
+def test_out_of_order_append_rejected():
+    ticks = make_ticks()
+    builder = BarBuilder().update(ticks.iloc[1000:])
+    with pytest.raises(ValueError):
+        builder.update(ticks.iloc[:1000])
+
+
+def test_bars_feed_rolling_metrics():
+    hourly = build_bars(make_ticks())["1h"]
+    res, _ = metrics.compute_rolling_pandas(hourly, window=5)
+    assert res["ma20"].notna().any()
+    assert len(res) == len(hourly)
@@ -0,0 +1,46 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Cumulative import time (microseconds, as reported by -X importtime) allowed
+# for each module. Generous enough for slow CI boxes, but far below what
+# pulling in matplotlib/polars costs.
+IMPORT_BUDGET_US = {
+    "parallel_fin.kernels": 400_000,
+    "parallel_fin.metrics": 1_500_000,
+}
+HEAVY = ("matplotlib", "polars", "tabulate", "psutil")
+
+
+def _importtime(module):
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=REPO_ROOT, capture_output=True, text=True, check=True,
+    )
+    cumulative = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cum, name = line[len("import time:"):].split("|")
+        cumulative[name.strip()] = int(cum)
+    return cumulative
+
+
+@pytest.mark.parametrize("module", sorted(IMPORT_BUDGET_US))
+def test_no_heavy_imports(module):
+    loaded = _importtime(module)
+    assert not [m for m in loaded if m.split(".")[0] in HEAVY]
+
+
+@pytest.mark.parametrize("module", sorted(IMPORT_BUDGET_US))
+def test_import_time_budget(module):
+    loaded = _importtime(module)
+    assert loaded[module] < IMPORT_BUDGET_US[module]
+
+
+def test_worker_module_skips_pandas():
+    assert "pandas" not in _importtime("parallel_fin.kernels")
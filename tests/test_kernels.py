@@ -0,0 +1,29 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from parallel_fin import kernels, metrics
+
+SERIES = [
+    [100, 90, np.nan, 95, 80, 85],
+    [np.nan, 100, 90, 120, 60],
+    [100, np.nan, np.nan, 50, 120],
+    [100, 101, 99, 102, 98, 97, 103],
+    [np.nan, np.nan],
+    [],
+]
+
+
+@pytest.mark.parametrize("prices", SERIES)
+def test_position_kernels_match_pandas_with_nan_prices(prices):
+    arr = np.asarray(prices, dtype=np.float64)
+    s = pd.Series(arr, index=pd.date_range("2024-01-01", periods=len(arr)))
+    np.testing.assert_equal(kernels.max_drawdown_array(arr), metrics.max_drawdown(s))
+    np.testing.assert_allclose(kernels.rolling_return_volatility_array(arr, window=3),
+                               metrics.rolling_return_volatility(s, window=3), equal_nan=True)
+
+
+def test_nan_price_keeps_drawdown_in_position_worker():
+    m = kernels.position_worker(("AAPL", 2.0, np.array([100, 90, np.nan, 95, 80, 85.0]), None, 20))
+    assert m.drawdown == pytest.approx(-0.2)
+    assert m.value == pytest.approx(170.0)
@@ -14,3 +14,172 @@ def test_rolling_pandas_vs_polars(sample_df):
 def test_sharpe_nonnegative(sample_df):
     res_pd, _ = metrics.compute_rolling_pandas(sample_df, window=20)
     assert res_pd["sharpe20"].notna().any()
+
+
+@pytest.fixture
+def synthetic_csv(tmp_path):
+    import numpy as np
+    import pandas as pd
+
+    rng = np.random.default_rng(0)
+    n = 600
+    ts = pd.Timestamp("2024-01-01") + pd.to_timedelta(np.sort(rng.integers(0, 10**9, n)), unit="ms")
+    df = pd.DataFrame({
+        "timestamp": ts,
+        "symbol": rng.choice(["MSFT", "AAPL", "SPY"], n),
+        "price": 100 * np.exp(np.cumsum(rng.normal(0, 1e-2, n))),
+    })
+    path = tmp_path / "md.csv"
+    df.to_csv(path, index=False)
+    return str(path)
+
+
+def test_compact_loader_dtypes(synthetic_csv):
+    import numpy as np
+
+    symbols = data_loader.SymbolDictionary()
+    df = data_loader.load_market_data_pandas(synthetic_csv, compact=True, symbols=symbols)
+    assert df["symbol"].dtype == np.int16
+    assert df.index.dtype == np.int64
+    assert symbols.symbols == ["AAPL", "MSFT", "SPY"]
+
+    pl_df = data_loader.load_market_data_polars(synthetic_csv, compact=True, symbols=symbols)
+    assert pl_df["symbol"].to_list() == df["symbol"].tolist()
+    assert pl_df["timestamp"].to_list() == df.index.tolist()
+
+
+def test_compact_metrics_within_float32_bound(synthetic_csv):
+    import numpy as np
+
+    ref, _ = metrics.compute_rolling_pandas(data_loader.load_market_data_pandas(synthetic_csv), window=20)
+    cmp_, _ = metrics.compute_rolling_pandas(
+        data_loader.load_market_data_pandas(synthetic_csv, compact=True), window=20, compact=True
+    )
+    for col in metrics.METRIC_COLUMNS:
+        assert cmp_[col].dtype == np.float32
+        np.testing.assert_allclose(cmp_[col].to_numpy(np.float64), ref[col].to_numpy(), rtol=2**-24, equal_nan=True)
+
+
+def test_compact_price_map_decodes_symbols(synthetic_csv):
+    default = metrics.build_symbol_price_map_pandas(data_loader.load_market_data_pandas(synthetic_csv))
+    compact = metrics.build_symbol_price_map_pandas(data_loader.load_market_data_pandas(synthetic_csv, compact=True))
+    assert sorted(compact) == sorted(default)
+    for sym in default:
+        assert compact[sym].tolist() == default[sym].tolist()
+        assert metrics.max_drawdown(compact[sym]) == metrics.max_drawdown(default[sym])
+
+
+def test_rolling_metrics_is_pure_and_reuses_out(synthetic_csv):
+    import numpy as np
+    import pandas as pd
+
+    df = data_loader.load_market_data_pandas(synthetic_csv)
+    before = df.copy()
+    out = np.empty((len(metrics.METRIC_COLUMNS), len(df)))
+    cols = metrics.rolling_metrics(df["price"].to_numpy(), df["symbol"], window=20, out=out)
+    pd.testing.assert_frame_equal(df, before)
+    assert all(np.shares_memory(v, out) for v in cols.values())
+
+    ref, _ = metrics.compute_rolling_pandas(df.copy(), window=20)
+    frame = metrics.rolling_metrics_frame(df, window=20, out=out)
+    pd.testing.assert_frame_equal(frame, ref[metrics.METRIC_COLUMNS])
+
+
+@pytest.mark.parametrize("window", ["15min", "1d"])
+def test_duration_windows_agree_across_engines(synthetic_csv, window):
+    import numpy as np
+
+    df = data_loader.load_market_data_pandas(synthetic_csv)
+    ref = metrics.rolling_metrics_frame(df, window)
+    vec = metrics.rolling_metrics_frame(df, window, engine="numpy")
+    pl_res, _ = metrics.compute_rolling_polars(data_loader.load_market_data_polars(synthetic_csv), window)
+    for col in metrics.METRIC_COLUMNS:
+        np.testing.assert_allclose(vec[col].to_numpy(), ref[col].to_numpy(), rtol=1e-6, equal_nan=True)
+        np.testing.assert_allclose(pl_res[col].to_numpy(), ref[col].to_numpy(), rtol=1e-6, equal_nan=True)
+
+
+def test_duration_window_matches_per_symbol_offset_rolling(synthetic_csv):
+    import numpy as np
+
+    df = data_loader.load_market_data_pandas(synthetic_csv)
+    res, _ = metrics.compute_rolling_pandas(df.copy(), window="1d")
+    for sym, g in df.groupby("symbol", observed=True):
+        np.testing.assert_allclose(res.loc[res["symbol"] == sym, "ma20"].to_numpy(),
+                                   g["price"].rolling("1D").mean().to_numpy())
+
+
+def test_numpy_engine_count_window(synthetic_csv):
+    import numpy as np
+
+    df = data_loader.load_market_data_pandas(synthetic_csv)
+    ref = metrics.rolling_metrics_frame(df, 20)
+    vec = metrics.rolling_metrics_frame(df, 20, engine="numpy")
+    np.testing.assert_allclose(vec.to_numpy(), ref.to_numpy(), rtol=1e-6, equal_nan=True)
+
+
+def test_duration_window_requires_timestamps():
+    with pytest.raises(ValueError):
+        metrics.rolling_metrics([1.0, 2.0, 3.0], window="1h")
+
+
+def test_numpy_engine_std_on_long_drifting_series():
+    import numpy as np
+    from numpy.lib.stride_tricks import sliding_window_view
+    from parallel_fin.kernels import count_window_starts, rolling_mean_std, time_window_starts
+
+    rng = np.random.default_rng(0)
+    n = 200_000
+    x = 100 + 0.5 * np.arange(n) + rng.normal(0, 0.01, n)
+    mean, std = rolling_mean_std(x, count_window_starts(n, 20), min_periods=20)
+    win = sliding_window_view(x, 20)
+    np.testing.assert_allclose(std[19:], win.std(axis=1, ddof=1), rtol=1e-9)
+    np.testing.assert_allclose(mean[19:], win.mean(axis=1), rtol=1e-12)
+    assert np.isnan(std[:19]).all()
+
+    # irregular duration windows with gaps and NaNs, against a two-pass loop
+    ts = np.cumsum(rng.integers(1, 10, 2000))
+    y = x[:2000].copy()
+    y[::37] = np.nan
+    starts = time_window_starts(ts, 50)
+    mean, std = rolling_mean_std(y, starts)
+    for i in range(0, 2000, 7):
+        w = y[starts[i]:i + 1]
+        w = w[~np.isnan(w)]
+        if len(w) >= 2:
+            np.testing.assert_allclose(std[i], w.std(ddof=1), rtol=1e-9)
+        if len(w):
+            np.testing.assert_allclose(mean[i], w.mean(), rtol=1e-12)
+        else:
+            assert np.isnan(mean[i])
+
+
+def test_compact_mode_keeps_missing_symbols_missing(synthetic_csv, tmp_path):
+    import numpy as np
+    import pandas as pd
+
+    raw = pd.read_csv(synthetic_csv)
+    raw.loc[[5, 300], "symbol"] = np.nan
+    path = tmp_path / "md_missing.csv"
+    raw.to_csv(path, index=False)
+
+    symbols = data_loader.SymbolDictionary()
+    default = data_loader.load_market_data_pandas(path)
+    compact = data_loader.load_market_data_pandas(path, compact=True, symbols=symbols)
+    missing = default["symbol"].isna().to_numpy()
+    assert missing.sum() == 2
+    assert (compact["symbol"].to_numpy()[missing] == symbols.MISSING).all()
+    assert (compact["symbol"].to_numpy()[~missing] >= 0).all()
+    assert symbols.decode(symbols.MISSING) is None
+
+    pl_df = data_loader.load_market_data_polars(path, compact=True, symbols=symbols)
+    assert pl_df["symbol"].to_list() == compact["symbol"].tolist()
+
+    default_map = metrics.build_symbol_price_map_pandas(default)
+    compact_map = metrics.build_symbol_price_map_pandas(compact)
+    assert sorted(compact_map) == sorted(default_map) == ["AAPL", "MSFT", "SPY"]
+    for sym in default_map:
+        assert compact_map[sym].tolist() == default_map[sym].tolist()
+
+    ref = metrics.rolling_metrics_frame(default, 20)
+    cmp_ = metrics.rolling_metrics_frame(compact, 20)
+    np.testing.assert_array_equal(cmp_.to_numpy(), ref.to_numpy())
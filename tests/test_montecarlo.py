@@ -0,0 +1,47 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from parallel_fin.montecarlo import estimate_return_model, monte_carlo_var_es
+from parallel_fin.scenarios import build_scenario_model
+
+Z_99 = 2.3263478740408408       # standard normal 99% quantile
+ES_99 = 2.665214220345808       # standard normal 99% expected shortfall
+
+
+@pytest.fixture
+def setup(portfolio_tree, random_prices):
+    model = build_scenario_model(portfolio_tree, random_prices)
+    mu, cov = estimate_return_model(random_prices, model.symbols)
+    return model, mu, cov
+
+
+def test_return_model_has_no_risk_for_unpriced_symbols(setup):
+    model, mu, cov = setup
+    spy = model.symbols.index("SPY")
+    assert mu[spy] == 0 and not cov[spy].any()
+    assert cov[0, 1] > 0
+
+
+def test_reproducible_across_worker_counts(setup):
+    model, mu, cov = setup
+    single = monte_carlo_var_es(model, mu, cov, n_paths=20_000, batch_size=5_000, seed=7)
+    pooled = monte_carlo_var_es(model, mu, cov, n_paths=20_000, batch_size=5_000, seed=7, max_workers=2)
+    pd.testing.assert_frame_equal(single, pooled)
+
+
+def test_matches_gaussian_closed_form(setup):
+    model, mu, cov = setup
+    res = monte_carlo_var_es(model, mu, cov, n_paths=200_000, alpha=0.99, batch_size=50_000, seed=1)
+
+    cs = np.concatenate([np.zeros((len(model.symbols), 1)), np.cumsum(model.exposure, axis=1)], axis=1)
+    subtree = cs[:, model.subtree_end] - cs[:, :-1]
+    for n, path in enumerate(model.node_paths):
+        x = subtree[:, n]
+        sigma = float(np.sqrt(x @ cov @ x))
+        mean_loss = -float(mu @ x)
+        np.testing.assert_allclose(res.loc[path, "var"], mean_loss + Z_99 * sigma, rtol=0.03)
+        np.testing.assert_allclose(res.loc[path, "es"], mean_loss + ES_99 * sigma, rtol=0.03)
+        # the sub-portfolio only holds SPY, which has no price history
+        if path.endswith("Index Holdings"):
+            assert res.loc[path, "var"] == 0
@@ -5,3 +5,91 @@ def test_thread_vs_process_equivalence():
     df_thread, _ = parallel.run_threaded(df, lib="pandas", window=10, max_workers=2)
     df_proc, _ = parallel.run_multiprocess(df, lib="pandas", window=10, max_workers=2)
     assert set(df_thread.columns) == set(df_proc.columns)
+
+
+def _synthetic_ticks(n=400, symbols=("AAPL", "MSFT", "SPY", "GOOG")):
+    import numpy as np
+    import pandas as pd
+
+    rng = np.random.default_rng(1)
+    idx = pd.to_datetime("2024-01-01") + pd.to_timedelta(np.sort(rng.integers(0, 10**6, n)), unit="s")
+    df = pd.DataFrame({"symbol": rng.choice(symbols, n), "price": 100 + rng.normal(0, 1, n).cumsum()}, index=idx)
+    df.index.name = "timestamp"
+    return df
+
+
+def test_merge_sorted_frames_matches_stable_sort():
+    import pandas as pd
+
+    df = _synthetic_ticks()
+    parts = [g for _, g in df.groupby("symbol")]
+    merged = parallel.merge_sorted_frames(parts)
+    expected = pd.concat(parts).sort_index(kind="stable")
+    pd.testing.assert_frame_equal(merged, expected)
+
+
+def test_iter_threaded_streams_every_symbol():
+    df = _synthetic_ticks()
+    seen = {sym: res for sym, res in parallel.iter_threaded(df, window=5, max_workers=2, max_in_flight=2)}
+    assert sorted(seen) == sorted(df["symbol"].unique())
+    assert sum(len(r) for r in seen.values()) == len(df)
+    assert all(r.index.is_monotonic_increasing for r in seen.values())
+
+
+def test_bounded_map_limits_in_flight():
+    import threading
+    import time
+    from concurrent.futures import ThreadPoolExecutor
+
+    lock, state = threading.Lock(), {"now": 0, "peak": 0}
+
+    def task(x):
+        with lock:
+            state["now"] += 1
+            state["peak"] = max(state["peak"], state["now"])
+        time.sleep(0.01)
+        with lock:
+            state["now"] -= 1
+        return x * 2
+
+    def items():
+        for i in range(10):
+            yield i, (i,)
+
+    with ThreadPoolExecutor(max_workers=8) as ex:
+        out = dict(parallel.bounded_map(ex, task, items(), max_in_flight=3))
+    assert out == {i: 2 * i for i in range(10)}
+    assert state["peak"] <= 3
+
+
+def _scaled(x):
+    return parallel.pool_state("scale") * x
+
+
+def test_process_pool_with_state():
+    with parallel.process_pool_with_state(2, scale=3) as ex:
+        out = dict(parallel.bounded_map(ex, _scaled, ((i, (i,)) for i in range(6)), max_in_flight=4))
+    assert out == {i: 3 * i for i in range(6)}
+
+
+def test_write_partitioned(tmp_path):
+    df = _synthetic_ticks()
+    paths = parallel.write_partitioned(parallel.iter_threaded(df, window=5, max_workers=2), tmp_path, fmt="csv")
+    assert sorted(p.split("symbol=")[1].split("/")[0] for p in paths) == sorted(df["symbol"].unique())
+
+
+def test_merge_sorted_frames_keeps_column_dtypes():
+    import pandas as pd
+
+    df = _synthetic_ticks()
+    df["symbol"] = df["symbol"].astype("category")
+    df["name"] = df["symbol"].astype(str)
+    df["count"] = range(len(df))
+    # per-part categories differ, as they do after polars round-trips
+    parts = [g.assign(symbol=g["symbol"].cat.remove_unused_categories()) for _, g in df.groupby("symbol", observed=True)]
+    merged = parallel.merge_sorted_frames(parts)
+    expected = pd.concat(parts).sort_index(kind="stable")
+    assert merged["count"].dtype == expected["count"].dtype
+    assert merged["name"].dtype == df["name"].dtype
+    assert isinstance(merged["symbol"].dtype, pd.CategoricalDtype)
+    pd.testing.assert_frame_equal(merged.astype({"symbol": str}), expected.astype({"symbol": str}))
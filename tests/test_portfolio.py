@@ -1,7 +1,7 @@
 import unittest
 import pandas as pd
 import numpy as np
-from parallel_fin.portfolio import aggregate_portfolio_sequential, aggregate_portfolio_multiprocessing
+from parallel_fin.portfolio import aggregate_portfolio_sequential, aggregate_portfolio_multiprocessing, aggregate_portfolios_batch
 
 # Mock helper to generate fake price data
 def make_symbol_prices():
@@ -58,5 +58,91 @@ class TestPortfolioAggregation(unittest.TestCase):
         print(" Nested sub-portfolio OK")
 
 
+
+def make_random_trees(n_trees, seed=0):
+    rng = np.random.default_rng(seed)
+    symbols = ["AAPL", "GOOG", "MSFT", "NOPRICE"]
+
+    def node(depth, name):
+        out = {"name": name, "positions": []}
+        for _ in range(int(rng.integers(0, 4))):
+            pos = {"symbol": str(rng.choice(symbols)), "quantity": float(rng.integers(-5, 50))}
+            if rng.random() < 0.5:
+                pos["price"] = float(rng.uniform(10, 100))
+            out["positions"].append(pos)
+        if depth < 3:
+            out["sub_portfolios"] = [node(depth + 1, f"{name}.{i}") for i in range(int(rng.integers(0, 3)))]
+        return out
+
+    return [node(0, f"book{i}") for i in range(n_trees)]
+
+
+def make_longer_prices():
+    dates = pd.date_range("2020-01-01", periods=40)
+    rng = np.random.default_rng(7)
+    return {
+        "AAPL": pd.Series(100 + rng.normal(0, 1, 40).cumsum(), index=dates),
+        "GOOG": pd.Series(200 + rng.normal(0, 2, 40).cumsum(), index=dates),
+        "MSFT": pd.Series(300 + rng.normal(0, 3, 40).cumsum(), index=dates),
+    }
+
+
+def assert_tree_close(test, a, b):
+    test.assertEqual(a["name"], b["name"])
+    for key in ("total_value", "aggregate_volatility", "max_drawdown"):
+        np.testing.assert_allclose(a[key], b[key], rtol=1e-12, atol=1e-9, equal_nan=True)
+    # the sequential path reorders repeated symbols; the batch path keeps spec order
+    key = lambda p: (p["symbol"], np.nan_to_num(p["value"]))
+    pos_a, pos_b = sorted(a["positions"], key=key), sorted(b["positions"], key=key)
+    test.assertEqual([p["symbol"] for p in pos_a], [p["symbol"] for p in pos_b])
+    for pa, pb in zip(pos_a, pos_b):
+        for key in ("value", "volatility", "drawdown"):
+            np.testing.assert_allclose(pa[key], pb[key], rtol=1e-12, equal_nan=True)
+    test.assertEqual(len(a["sub_portfolios"]), len(b["sub_portfolios"]))
+    for sa, sb in zip(a["sub_portfolios"], b["sub_portfolios"]):
+        assert_tree_close(test, sa, sb)
+
+
+class TestBatchAggregation(unittest.TestCase):
+    def setUp(self):
+        self.symbol_prices = make_longer_prices()
+        self.trees = make_random_trees(60)
+
+    def test_batch_matches_sequential(self):
+        """Every tree in the batch equals its own sequential aggregation."""
+        results = aggregate_portfolios_batch(self.trees, self.symbol_prices)
+        self.assertEqual(len(results), len(self.trees))
+        for tree, res in zip(self.trees, results):
+            assert_tree_close(self, res, aggregate_portfolio_sequential(tree, self.symbol_prices))
+
+    def test_batch_parallel_keeps_input_order(self):
+        """Process-pool chunks come back in input order."""
+        seq = aggregate_portfolios_batch(self.trees, self.symbol_prices)
+        par = aggregate_portfolios_batch(self.trees, self.symbol_prices, max_workers=2, chunks_per_worker=3)
+        self.assertEqual([r["name"] for r in par], [r["name"] for r in seq])
+        for a, b in zip(seq, par):
+            assert_tree_close(self, a, b)
+
+    def test_batch_isolates_bad_trees(self):
+        """A malformed tree yields an error entry without affecting the others."""
+        bad = [
+            {"name": "bad", "positions": [{"quantity": 1}]},
+            "not a tree",
+            {"name": "b", "positions": 5},
+            {"name": "b", "sub_portfolios": 5},
+            {"name": "b", "positions": [{"symbol": ["A"], "quantity": 1}]},
+            {"name": "b", "sub_portfolios": [{"name": "c", "positions": [{"symbol": {"A": 1}}]}]},
+        ]
+        trees = [TEST_PORTFOLIO] + bad + [TEST_PORTFOLIO]
+        expected = aggregate_portfolio_sequential(TEST_PORTFOLIO, make_symbol_prices())
+        for workers in (1, 2):
+            results = aggregate_portfolios_batch(trees, make_symbol_prices(), max_workers=workers)
+            self.assertEqual(len(results), len(trees))
+            for res in results[1:-1]:
+                self.assertEqual(set(res), {"error"})
+            assert_tree_close(self, results[0], expected)
+            assert_tree_close(self, results[-1], expected)
+
+
 if __name__ == "__main__":
     unittest.main(verbosity=2)
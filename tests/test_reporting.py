@@ -0,0 +1,69 @@
+import json
+
+import numpy as np
+import pytest
+
+from parallel_fin.reporting import (
+    nan_to_none,
+    iter_portfolio_json,
+    portfolio_to_tables,
+    save_portfolio_columnar,
+    save_portfolio_json,
+)
+
+RESULT = {
+    "name": "Root é",
+    "total_value": 1234.5,
+    "aggregate_volatility": float("nan"),
+    "max_drawdown": np.float64(-0.25),
+    "positions": [
+        {"symbol": "AAPL", "value": 1000.0, "volatility": 0.01, "drawdown": -0.1},
+        {"symbol": "X", "value": float("inf"), "volatility": float("nan"), "drawdown": None},
+    ],
+    "sub_portfolios": [
+        {"name": "Sub", "total_value": 234.5, "aggregate_volatility": 0.02, "max_drawdown": -0.25,
+         "positions": [{"symbol": "GOOG", "value": 234.5, "volatility": 0.02, "drawdown": -0.25}],
+         "sub_portfolios": []},
+    ],
+}
+
+
+@pytest.mark.parametrize("indent", [2, None])
+def test_stream_matches_json_dumps(indent):
+    expected = json.dumps(nan_to_none(RESULT), indent=indent, ensure_ascii=False)
+    assert "".join(iter_portfolio_json(RESULT, indent)) == expected
+
+
+def test_save_portfolio_json_roundtrip(tmp_path):
+    path = tmp_path / "out.json"
+    save_portfolio_json(RESULT, path)
+    loaded = json.loads(path.read_text(encoding="utf-8"))
+    assert loaded["aggregate_volatility"] is None
+    assert loaded["positions"][1]["value"] is None
+    assert loaded["sub_portfolios"][0]["name"] == "Sub"
+
+
+def test_portfolio_to_tables_parent_ids():
+    nodes, positions = portfolio_to_tables([RESULT, RESULT["sub_portfolios"][0]])
+    assert nodes["node_id"].tolist() == [0, 1, 2]
+    assert nodes["parent_id"].tolist() == [-1, 0, -1]
+    assert nodes["depth"].tolist() == [0, 1, 0]
+    assert positions["node_id"].tolist() == [0, 0, 1, 2]
+    assert np.isnan(positions["drawdown"].iloc[1])
+
+
+def test_save_portfolio_columnar(tmp_path):
+    pytest.importorskip("pyarrow")
+    import pandas as pd
+
+    nodes_path, positions_path = save_portfolio_columnar(RESULT, tmp_path)
+    nodes = pd.read_parquet(nodes_path, columns=["node_id", "parent_id"])
+    assert nodes["parent_id"].tolist() == [-1, 0]
+    assert len(pd.read_parquet(positions_path)) == 3
+
+
+def test_stream_accepts_sub_tree_iterator(tmp_path):
+    streamed = dict(RESULT, sub_portfolios=(dict(s) for s in RESULT["sub_portfolios"]))
+    path = tmp_path / "out.json"
+    save_portfolio_json(streamed, path, buffer_size=16)
+    assert path.read_text(encoding="utf-8") == json.dumps(nan_to_none(RESULT), indent=2, ensure_ascii=False)
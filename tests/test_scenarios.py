@@ -0,0 +1,65 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from parallel_fin.portfolio import aggregate_portfolio_sequential
+from parallel_fin.scenarios import (
+    ScenarioModel,
+    build_scenario_model,
+    historical_shocks,
+    run_scenarios,
+    sector_shocks,
+)
+
+
+def test_base_values_match_aggregation(portfolio_tree, linear_prices):
+    model = build_scenario_model(portfolio_tree, linear_prices)
+    agg = aggregate_portfolio_sequential(portfolio_tree, linear_prices)
+    assert model.node_paths == ["Main Portfolio", "Main Portfolio/Index Holdings"]
+    np.testing.assert_allclose(model.base_value, [agg["total_value"], agg["sub_portfolios"][0]["total_value"]])
+
+
+def test_uniform_shock_scales_every_node(portfolio_tree, linear_prices):
+    model = build_scenario_model(portfolio_tree, linear_prices)
+    shocks = np.array([[-0.1] * len(model.symbols), [0.05] * len(model.symbols)])
+    pnl = run_scenarios(model, shocks)
+    np.testing.assert_allclose(pnl.to_numpy(), np.outer([-0.1, 0.05], model.base_value))
+
+
+def test_chunked_parallel_matches_single_pass(portfolio_tree, linear_prices):
+    model = build_scenario_model(portfolio_tree, linear_prices)
+    rng = np.random.default_rng(0)
+    shocks = pd.DataFrame(rng.normal(0, 0.02, (1000, len(model.symbols))), columns=model.symbols)
+    single = run_scenarios(model, shocks, chunk_size=len(shocks))
+    chunked = run_scenarios(model, shocks, chunk_size=128, max_workers=2)
+    pd.testing.assert_frame_equal(single, chunked)
+
+
+def test_sector_and_historical_shocks(portfolio_tree, linear_prices):
+    model = build_scenario_model(portfolio_tree, linear_prices)
+    moves = pd.DataFrame({"tech": [-0.2], "index": [0.1]})
+    shocks = sector_shocks(moves, {"AAPL": "tech", "MSFT": "tech", "SPY": "index"}, model.symbols)
+    assert shocks.tolist() == [[-0.2, -0.2, 0.1]]
+
+    hist = historical_shocks(linear_prices, model.symbols)
+    assert len(hist) == 9
+    assert (hist["SPY"] == 0).all()
+    np.testing.assert_allclose(hist["AAPL"].iloc[0], 101.11111111111111 / 100 - 1)
+
+
+class FailingChunkModel(ScenarioModel):
+    """Fails on any chunk whose first shock is exactly 99."""
+
+    def pnl(self, shocks):
+        if shocks[0, 0] == 99:
+            raise ValueError("bad chunk")
+        return super().pnl(shocks)
+
+
+def test_failed_chunk_raises_instead_of_nan_rows(portfolio_tree, linear_prices):
+    base = build_scenario_model(portfolio_tree, linear_prices)
+    model = FailingChunkModel(**vars(base))
+    shocks = np.zeros((512, len(model.symbols)))
+    shocks[256, 0] = 99
+    with pytest.raises(RuntimeError, match="1 of 4 scenario chunks failed"):
+        run_scenarios(model, shocks, chunk_size=128, max_workers=2)
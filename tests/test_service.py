@@ -0,0 +1,169 @@
+import asyncio
+import json
+import os
+import socket
+import tempfile
+import threading
+
+import pytest
+
+from parallel_fin.portfolio import aggregate_portfolio_sequential
+from parallel_fin.reporting import nan_to_none
+from parallel_fin.service import AggregationService, request_aggregation
+
+
+TREE = {
+    "name": "Root",
+    "positions": [{"symbol": "AAPL", "quantity": 10}, {"symbol": "MISSING", "quantity": 3, "price": 5.0}],
+    "sub_portfolios": [{"name": "Sub", "positions": [{"symbol": "MSFT", "quantity": 2}]}],
+}
+
+
+def test_precomputed_matches_sequential(random_prices):
+    prices = random_prices
+    service = AggregationService(prices, max_workers=0)
+    result = asyncio.run(service.aggregate(TREE))
+    assert result == nan_to_none(aggregate_portfolio_sequential(TREE, prices))
+
+
+def test_socket_roundtrip_and_batch(random_prices):
+    prices = random_prices
+    service = AggregationService(prices, max_workers=2, batch_chunk=1)
+    expected = nan_to_none(aggregate_portfolio_sequential(TREE, prices))
+
+    async def run(path):
+        ready = asyncio.Event()
+        server = asyncio.create_task(service.serve(socket_path=path, ready=ready))
+        await ready.wait()
+        try:
+            single = await asyncio.to_thread(request_aggregation, TREE, path)
+            batch = await asyncio.to_thread(request_aggregation, [TREE, TREE, TREE], path)
+        finally:
+            server.cancel()
+        return single, batch
+
+    with tempfile.TemporaryDirectory() as d:
+        single, batch = asyncio.run(run(os.path.join(d, "agg.sock")))
+    assert single == expected
+    assert batch == [expected] * 3
+
+
+def test_identical_concurrent_requests_are_coalesced(random_prices):
+    service = AggregationService(random_prices, max_workers=0)
+
+    async def run():
+        return await asyncio.gather(*(service.aggregate([TREE]) for _ in range(5)))
+
+    results = asyncio.run(run())
+    assert all(r == results[0] for r in results)
+    assert service.computed == 1
+
+
+def test_cancelling_first_caller_does_not_strand_coalesced_requests(random_prices):
+    service = AggregationService(random_prices, max_workers=0)
+    gate = threading.Event()
+    aggregate_local = service._aggregate_local
+
+    def slow_aggregate(trees):
+        gate.wait(5)
+        return aggregate_local(trees)
+
+    service._aggregate_local = slow_aggregate
+
+    async def run():
+        first = asyncio.create_task(service.aggregate(TREE))
+        second = asyncio.create_task(service.aggregate(TREE))
+        await asyncio.sleep(0.05)
+        first.cancel()
+        await asyncio.sleep(0)
+        gate.set()
+        result = await asyncio.wait_for(second, timeout=5)
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return result
+
+    assert asyncio.run(run()) == nan_to_none(aggregate_portfolio_sequential(TREE, random_prices))
+    assert service.computed == 1
+    assert not service._inflight
+
+
+def test_http_post_aggregate(random_prices):
+    import urllib.error
+    import urllib.request
+
+    prices = random_prices
+    service = AggregationService(prices, max_workers=0)
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+
+    def post(path, payload):
+        req = urllib.request.Request(f"http://127.0.0.1:{port}{path}", data=payload,
+                                     headers={"Content-Type": "application/json"})
+        try:
+            with urllib.request.urlopen(req, timeout=5) as resp:
+                return resp.status, json.loads(resp.read())
+        except urllib.error.HTTPError as e:
+            return e.code, json.loads(e.read())
+
+    async def run():
+        ready = asyncio.Event()
+        server = asyncio.create_task(service.serve(port=port, ready=ready))
+        await ready.wait()
+        try:
+            ok = await asyncio.to_thread(post, "/aggregate", json.dumps(TREE).encode())
+            bad = await asyncio.to_thread(post, "/aggregate", b"not json")
+            missing = await asyncio.to_thread(post, "/other", b"{}")
+            lines = await asyncio.to_thread(request_aggregation, [TREE], None, "127.0.0.1", port)
+        finally:
+            server.cancel()
+        return ok, bad, missing, lines
+
+    ok, bad, missing, lines = asyncio.run(run())
+    expected = nan_to_none(aggregate_portfolio_sequential(TREE, prices))
+    assert ok == (200, expected)
+    assert bad[0] == 400 and "error" in bad[1]
+    assert missing[0] == 404
+    assert lines == [expected]
+
+
+def test_start_pool_launches_workers(random_prices):
+    import multiprocessing
+
+    service = AggregationService(random_prices, max_workers=2)
+    before = len(multiprocessing.active_children())
+    service.start_pool()
+    try:
+        assert len(multiprocessing.active_children()) - before == 2
+    finally:
+        service.close()
+
+
+def test_http_expect_100_continue(random_prices):
+    service = AggregationService(random_prices, max_workers=0)
+    body = json.dumps(TREE).encode()
+
+    async def run(path):
+        ready = asyncio.Event()
+        server = asyncio.create_task(service.serve(socket_path=path, ready=ready))
+        await ready.wait()
+        try:
+            reader, writer = await asyncio.open_unix_connection(path)
+            writer.write(b"POST /aggregate HTTP/1.1\r\nHost: localhost\r\nContent-Type: application/json\r\n"
+                         b"Expect: 100-continue\r\nContent-Length: %d\r\n\r\n" % len(body))
+            await writer.drain()
+            interim = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), timeout=0.5)
+            writer.write(body)
+            await writer.drain()
+            response = await asyncio.wait_for(reader.read(), timeout=5)
+            writer.close()
+        finally:
+            server.cancel()
+        return interim, response
+
+    with tempfile.TemporaryDirectory() as d:
+        interim, response = asyncio.run(run(os.path.join(d, "agg.sock")))
+    assert interim.startswith(b"HTTP/1.1 100 Continue")
+    head, _, payload = response.partition(b"\r\n\r\n")
+    assert head.startswith(b"HTTP/1.1 200")
+    assert json.loads(payload) == nan_to_none(aggregate_portfolio_sequential(TREE, random_prices))